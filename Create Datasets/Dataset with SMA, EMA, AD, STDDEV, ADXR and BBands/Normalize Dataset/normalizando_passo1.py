@@ -1,6 +1,11 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import numpy as np
-import os
+
+from candle_store import INDICATOR_DTYPE, apply_schema
 
 class TradingStrategy:
     def __init__(self, file_path):
@@ -9,7 +14,7 @@ class TradingStrategy:
 
     def load_data(self):  # carregar dataset
         try:
-            self.data = pd.read_csv(self.file_path)
+            self.data = apply_schema(pd.read_csv(self.file_path))
             print(f"Data loaded from {self.file_path} successfully.")
         except Exception as e:
             print(f"Error loading data from {self.file_path}: {e}")
@@ -29,7 +34,7 @@ class TradingStrategy:
 
             for col in all_cols:
                 if col in self.data.columns:
-                    self.data[col] = self.data[col] / prev_close
+                    self.data[col] = (self.data[col] / prev_close).astype(INDICATOR_DTYPE)
 
             print("Indicators normalized by previous close successfully.")
         except Exception as e:
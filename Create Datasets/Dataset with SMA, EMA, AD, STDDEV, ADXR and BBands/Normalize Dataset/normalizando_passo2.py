@@ -1,6 +1,12 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import numpy as np
 
+from candle_store import FEATURE_DTYPE, apply_schema
+
 class TradingNormalizer:
     def __init__(self, file_path):
         self.file_path = file_path
@@ -8,7 +14,7 @@ class TradingNormalizer:
 
     def load_data(self):
         try:
-            self.data = pd.read_csv(self.file_path)
+            self.data = apply_schema(pd.read_csv(self.file_path))
             print(f"Data loaded from {self.file_path} successfully.")
         except Exception as e:
             print(f"Error loading data: {e}")
@@ -25,7 +31,7 @@ class TradingNormalizer:
                 if col in self.data.columns:
                     col_min = self.data[col].min()
                     col_max = self.data[col].max()
-                    self.data[col] = (self.data[col] - col_min) / (col_max - col_min)
+                    self.data[col] = ((self.data[col] - col_min) / (col_max - col_min)).astype(FEATURE_DTYPE)
 
             print("SMA, EMA and std normalized successfully.")
         except Exception as e:
@@ -38,7 +44,7 @@ class TradingNormalizer:
                 self.data["Bollinger_Norm"] = (
                     (prev_close - self.data["Bollinger_Lower"]) /
                     (self.data["Bollinger_Upper"] - self.data["Bollinger_Lower"])
-                )
+                ).astype(FEATURE_DTYPE)
                 # remove as colunas antigas
                 self.data.drop(columns=["Bollinger_Mid", "Bollinger_Upper", "Bollinger_Lower"], inplace=True)
                 print("Bollinger Bands normalized into a single column successfully.")
@@ -48,14 +54,14 @@ class TradingNormalizer:
     def normalize_adxr(self):
         try:
             if "ADXR" in self.data.columns:
-                self.data["ADXR"] = self.data["ADXR"] / 100
+                self.data["ADXR"] = (self.data["ADXR"] / 100).astype(FEATURE_DTYPE)
                 print("ADXR normalized successfully.")
         except Exception as e:
             print(f"Error normalizing ADXR: {e}")
 
     def add_trend(self):
         try:
-            self.data["trend"] = np.where(self.data["close"] > self.data["close"].shift(1), 1, 0)
+            self.data["trend"] = np.where(self.data["close"] > self.data["close"].shift(1), 1, 0).astype("int8")
             print("Trend column added successfully.")
         except Exception as e:
             print(f"Error adding trend: {e}")
@@ -0,0 +1,147 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Armazenamento colunar dos candles do Price5, particionado por id_ticker e mês:
+#   <root>/id_ticker=58413/month=2024_01/part-0.parquet
+# O id_ticker e o mês ficam no caminho (particionamento hive) e não dentro do arquivo.
+
+# Esquema compacto usado por todos os loaders e etapas:
+#  - preços em ticks inteiros (int32); somas móveis/acumuladas de preço sempre em int64 (RollingStats)
+#  - id_ticker categórico e chave de pregão inteira (session = AAAAMMDD, int32)
+#  - indicadores em nível de preço (SMA, EMA, std, bandas, A/D, ADXR) em float64 até a normalização;
+#    só as features finais normalizadas (normalizando_passo2) são reduzidas para float32
+COLUMN_DTYPES = {
+    "open": "int32",
+    "close": "int32",
+    "high": "int32",
+    "low": "int32",
+    "average": "float64",
+    "volume": "float64",
+    "business": "int32",
+    "amount_stock": "int64",
+    "session": "int32",
+    "trend": "int8",
+}
+INDICATOR_DTYPE = "float64"
+FEATURE_DTYPE = "float32"
+FEATURE_PREFIXES = ("SMA", "EMA", "std_", "Bollinger_", "AD_Line", "ADXR")
+
+# Colunas gravadas em cada partição, já com o tipo final
+CANDLE_SCHEMA = pa.schema([
+    ("datetime", pa.timestamp("s")),
+    ("open", pa.int32()),
+    ("close", pa.int32()),
+    ("high", pa.int32()),
+    ("low", pa.int32()),
+    ("average", pa.float64()),
+    ("volume", pa.float64()),
+    ("business", pa.int32()),
+    ("amount_stock", pa.int64()),
+])
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("id_ticker", pa.int32()), ("month", pa.string())]), flavor="hive"
+)
+
+
+def session_key(datetimes):  # datetime64 -> 20240102 (int32)
+    return (datetimes.dt.year * 10000 + datetimes.dt.month * 100 + datetimes.dt.day).astype(COLUMN_DTYPES["session"])
+
+
+def apply_schema(df):
+    # Converte as colunas conhecidas para o esquema compacto (as demais ficam como estão)
+    for column, dtype in COLUMN_DTYPES.items():
+        if column in df.columns and df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+    if "id_ticker" in df.columns and not isinstance(df["id_ticker"].dtype, pd.CategoricalDtype):
+        df["id_ticker"] = df["id_ticker"].astype("category")
+    for column in df.columns:
+        if column.startswith(FEATURE_PREFIXES) and df[column].dtype != INDICATOR_DTYPE:
+            df[column] = df[column].astype(INDICATOR_DTYPE)
+    return df
+
+
+def month_key(dates):  # '2024-01-02' -> '2024_01'
+    return pd.to_datetime(dates).dt.strftime("%Y_%m")
+
+
+def partition_path(root, id_ticker, month):
+    return os.path.join(root, f"id_ticker={int(id_ticker)}", f"month={month}", "part-0.parquet")
+
+
+def to_candle_table(df):
+    # Converte as linhas do Price5 (date/time em texto) para a tabela tipada da partição
+    df = df.copy()
+    if "datetime" not in df.columns:
+        df["datetime"] = pd.to_datetime(df["date"] + " " + df["time"], format="%Y-%m-%d %H:%M:%S")
+    df = df.sort_values("datetime", kind="mergesort")
+    return pa.Table.from_pandas(df[CANDLE_SCHEMA.names], schema=CANDLE_SCHEMA, preserve_index=False)
+
+
+def write_partition(df, root, id_ticker, month):
+    # Grava (ou substitui) uma única partição (id_ticker, month)
+    path = partition_path(root, id_ticker, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(to_candle_table(df), path)
+    return path
+
+
+def append_partition(df, root, id_ticker, month):
+    # Acrescenta linhas novas a uma partição existente; linhas repetidas na fronteira
+    # (mesmo datetime) ficam com a versão mais recente
+    path = partition_path(root, id_ticker, month)
+    new = to_candle_table(df)
+    if os.path.exists(path):
+        merged = pa.concat_tables([pq.read_table(path, schema=CANDLE_SCHEMA), new]).to_pandas()
+        merged = merged.drop_duplicates(subset="datetime", keep="last").sort_values("datetime", kind="mergesort")
+        new = pa.Table.from_pandas(merged, schema=CANDLE_SCHEMA, preserve_index=False)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(new, path)
+    return path
+
+
+def partition_has_rows(df, root, id_ticker, month):
+    # True quando a partição já guarda exatamente estas linhas (mesmos datetime e mesmos valores);
+    # lê só as linhas desses datetime, sem regravar nada
+    path = partition_path(root, id_ticker, month)
+    if not os.path.exists(path):
+        return False
+    rows = to_candle_table(df)
+    stored = pq.read_table(path, schema=CANDLE_SCHEMA,
+                           filters=[("datetime", "in", rows.column("datetime").to_pylist())])
+    return stored.sort_by("datetime").equals(rows)
+
+
+def write_store(df, root):
+    # Divide o dataframe do Price5 em partições (id_ticker, month) e grava cada uma
+    months = month_key(df["date"])
+    paths = []
+    for (id_ticker, month), part in df.groupby([df["id_ticker"], months], sort=True):
+        paths.append(write_partition(part, root, id_ticker, month))
+    return paths
+
+
+def load_store(root, id_tickers=None, months=None, columns=None):
+    # Lê apenas as partições e colunas pedidas; retorna um dataframe indexado por datetime
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+
+    filtro = None
+    if id_tickers is not None:
+        filtro = ds.field("id_ticker").isin([int(t) for t in id_tickers])
+    if months is not None:
+        filtro_mes = ds.field("month").isin(list(months))
+        filtro = filtro_mes if filtro is None else filtro & filtro_mes
+
+    if columns is None:
+        columns = ["id_ticker"] + CANDLE_SCHEMA.names
+    else:
+        columns = ["id_ticker", "datetime"] + [c for c in columns if c not in ("id_ticker", "datetime")]
+
+    table = dataset.to_table(columns=columns, filter=filtro)
+    df = table.to_pandas()
+    df = df.sort_values(["datetime", "id_ticker"], kind="mergesort")
+    df.set_index("datetime", inplace=True)
+    return apply_schema(df)
@@ -1,39 +1,55 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+from candle_store import INDICATOR_DTYPE, apply_schema, load_store, session_key
+
+# Motor de médias/desvios móveis por somas acumuladas, compartilhado com o AG das Bandas de Bollinger
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "Genetic Algorithms on Bollinger Bands"))
+from RollingStats import RollingStats
 
 class TradingStrategy:
     def __init__(self, file_path):
         self.file_path = file_path
         self.data = None
 
-    def load_data(self):  # função para carregar e organizar o dados
+    def load_data(self, id_tickers=None, months=None, columns=None):  # função para carregar e organizar o dados
         try:
-            self.data = pd.read_csv(self.file_path)
-            self.data['datetime'] = pd.to_datetime(self.data['date'] + ' ' + self.data['time'])
-            self.data.set_index('datetime', inplace=True)
-            self.data.drop(columns=['date', 'time'], inplace=True)
+            if os.path.isdir(self.file_path):
+                # Armazenamento Parquet particionado: lê só as partições/colunas pedidas, já tipadas
+                self.data = load_store(self.file_path, id_tickers=id_tickers, months=months, columns=columns)
+            else:
+                self.data = pd.read_csv(self.file_path)
+                self.data['datetime'] = pd.to_datetime(self.data['date'] + ' ' + self.data['time'])
+                self.data.set_index('datetime', inplace=True)
+                self.data.drop(columns=['date', 'time'], inplace=True)
+                apply_schema(self.data)
             print(f"Data loaded from {self.file_path} successfully.")
         except Exception as e:
             print(f"Error loading data from {self.file_path}: {e}")
 
+    def _group_keys(self):
+        return [self.data['id_ticker'], self.data['session']]
+
     def add_technical_indicators(self):  # adicionar os indicadores de MA
         try:
             self.data = self.data.reset_index()
-            self.data['date'] = self.data['datetime'].dt.date  # Adicionar coluna apenas com a data
+            self.data['session'] = session_key(self.data['datetime'])  # Chave inteira do pregão (AAAAMMDD)
+
+            # Somas acumuladas exatas de close dentro de cada (id_ticker, session), reaproveitadas por todas as SMAs
+            close_stats = RollingStats(self.data['close'], groups=self._group_keys())
 
             # SMA e EMA com períodos extras
             for window in [3, 5, 7, 9, 11]:
                 # Calcula SMA
-                self.data[f'SMA_{window}'] = (
-                    self.data.groupby(['id_ticker', 'date'])['close']
-                    .transform(lambda x: x.rolling(window=window, min_periods=window).mean().round(4))
-                )
+                self.data[f'SMA_{window}'] = close_stats.mean(window).round(4).astype(INDICATOR_DTYPE)
 
                 # Calcula EMA
                 self.data[f'EMA_{window}'] = (
-                    self.data.groupby(['id_ticker', 'date'])['close']
+                    self.data.groupby(['id_ticker', 'session'], observed=True)['close']
                     .transform(lambda x: x.ewm(span=window, adjust=False).mean().round(4))
+                    .astype(INDICATOR_DTYPE)
                 )
 
             print("Technical indicators added successfully.")
@@ -45,13 +61,15 @@ class TradingStrategy:
             for window in [3, 5, 7, 9, 11]:
                 # calcula para desvio padrão close e open
                 self.data[f'std_close{window}'] = (
-                    self.data.groupby(['id_ticker', 'date'])['close']
+                    self.data.groupby(['id_ticker', 'session'], observed=True)['close']
                     .transform(lambda x: x.rolling(window=window, min_periods=window).std().round(4))
+                    .astype(INDICATOR_DTYPE)
                 )
 
                 self.data[f'std_open{window}'] = (
-                    self.data.groupby(['id_ticker', 'date'])['open']
+                    self.data.groupby(['id_ticker', 'session'], observed=True)['open']
                     .transform(lambda x: x.rolling(window=window, min_periods=window).std().round(4))
+                    .astype(INDICATOR_DTYPE)
                 )
 
             print("std features and standard deviations added successfully.")
@@ -60,13 +78,12 @@ class TradingStrategy:
 
     def add_bollinger_bands(self, period=7, std_factor=0.7929549):
         try:
-            grouped = self.data.groupby(['id_ticker', 'date'])
-            rolling_mean = grouped['close'].transform(lambda x: x.rolling(window=period).mean())
-            rolling_std = grouped['close'].transform(lambda x: x.rolling(window=period).std())
+            stats = RollingStats(self.data['close'], groups=self._group_keys())
+            rolling_mean, rolling_std = stats.mean_std(period)
 
-            self.data['Bollinger_Mid'] = rolling_mean.round(4)
-            self.data['Bollinger_Upper'] = (rolling_mean + std_factor * rolling_std).round(4)
-            self.data['Bollinger_Lower'] = (rolling_mean - std_factor * rolling_std).round(4)
+            self.data['Bollinger_Mid'] = rolling_mean.round(4).astype(INDICATOR_DTYPE)
+            self.data['Bollinger_Upper'] = (rolling_mean + std_factor * rolling_std).round(4).astype(INDICATOR_DTYPE)
+            self.data['Bollinger_Lower'] = (rolling_mean - std_factor * rolling_std).round(4).astype(INDICATOR_DTYPE)
 
             print("Bollinger Bands added successfully.")
         except Exception as e:
@@ -84,9 +101,7 @@ class TradingStrategy:
             mfv = mfm * self.data['volume']
 
             # Chaikin A/D Line (cumulativo por ticker)
-            self.data['AD_Line'] = self.data.groupby('id_ticker').apply(
-                lambda g: mfv.loc[g.index].cumsum()
-            ).reset_index(level=0, drop=True)
+            self.data['AD_Line'] = mfv.groupby(self.data['id_ticker'], observed=True).cumsum().astype(INDICATOR_DTYPE)
 
             print("Chaikin A/D Line added successfully.")
         except Exception as e:
@@ -125,7 +140,7 @@ class TradingStrategy:
             # ADXR
             adxr = ((adx + adx.shift(period)) / 2).round(4)
 
-            self.data['ADXR'] = adxr
+            self.data['ADXR'] = adxr.astype(INDICATOR_DTYPE)
 
             print("ADXR added successfully.")
         except Exception as e:
@@ -153,7 +168,8 @@ def process_single_file(input_file, output_file):
 
 
 if __name__ == '__main__':
-    input_file = r"C:\\Users\\othav\\BovDB.v2\\dados.csv"
+    # Aceita o dados.csv antigo ou o diretório Parquet gerado pelo price_5_CSV.py
+    input_file = r"C:\\Users\\othav\\BovDB.v2\\dados_parquet"
     output_file = r"C:\\Users\\othav\\BovDB.v2\\dados_indicadores.csv"
 
     # Process the single CSV file
@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Normalize Dataset"))
+
+from candle_store import apply_schema
+from inidicadores import TradingStrategy
+import normalizando_passo1
+import normalizando_passo2
+
+# Executa inidicadores.py -> normalizando_passo1.py -> normalizando_passo2.py no mesmo processo.
+# O dataframe (arrays NumPy) passa de uma etapa para a outra por referência; só o arquivo final
+# é gravado. Com debug_dir os CSVs intermediários de sempre também são gerados.
+
+
+def handoff(stage, data):
+    # Reproduz o que a ida e volta pelo CSV fazia entre as etapas: dropna + índice novo
+    stage.data = apply_schema(data.dropna().reset_index(drop=True))
+    return stage
+
+
+def dump(data, debug_dir, filename):
+    if debug_dir:
+        os.makedirs(debug_dir, exist_ok=True)
+        path = os.path.join(debug_dir, filename)
+        data.dropna().to_csv(path, index=False)
+        print(f"Debug dump saved to {path}")
+
+
+def run_pipeline(input_path, output_file, id_tickers=None, months=None, debug_dir=None):
+    print(f"\nProcessing: {input_path}")
+
+    # Etapa 1: indicadores técnicos
+    strategy = TradingStrategy(input_path)
+    strategy.load_data(id_tickers=id_tickers, months=months)
+    strategy.add_technical_indicators()
+    strategy.add_std_features()
+    strategy.add_bollinger_bands(period=7, std_factor=0.7929549)
+    strategy.add_ad_line()
+    strategy.add_adxr(period=14)
+    dump(strategy.data, debug_dir, "dados_indicadores.csv")
+
+    # Etapa 2: normalização pelo fechamento anterior
+    step1 = handoff(normalizando_passo1.TradingStrategy(None), strategy.data)
+    step1.normalize_indicators_by_prev_close()
+    dump(step1.data, debug_dir, "normalizados_passo1.csv")
+
+    # Etapa 3: min-max, Bollinger, ADXR e tendência
+    step2 = handoff(normalizando_passo2.TradingNormalizer(None), step1.data)
+    step2.normalize_sma_ema_std()
+    step2.normalize_bollinger()
+    step2.normalize_adxr()
+    step2.add_trend()
+    step2.save_data(output_file)
+    return step2.data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o dataset normalizado em um único processo")
+    parser.add_argument("input", help="diretório Parquet do price_5_CSV.py ou dados.csv")
+    parser.add_argument("output", help="CSV final (normalizados_passo2.csv)")
+    parser.add_argument("--tickers", type=int, nargs="*", default=None)
+    parser.add_argument("--months", nargs="*", default=None, help="ex.: 2024_01 2024_02")
+    parser.add_argument("--debug-dir", default=None, help="grava também os CSVs intermediários")
+    args = parser.parse_args()
+
+    run_pipeline(args.input, args.output, args.tickers, args.months, args.debug_dir)
@@ -1,5 +1,14 @@
+import argparse
+import json
+import os
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from urllib.request import pathname2url
+
 import pandas as pd
+import pyarrow.parquet as pq
+
+from candle_store import append_partition, partition_has_rows, partition_path, write_partition, write_store
 
 # Caminho para o banco de dados
 db_path = r'C:\\Users\\othav\\BovDB.v2\\Database_define.db'
@@ -14,41 +23,211 @@ config = {
     "2024_06": {"start_date": "2024-06-01", "end_date": "2024-06-30", "id_tickers": (2963, 2978)},
 }
 
-# Conexão com o banco de dados
-conn = sqlite3.connect(db_path)
+# Diretório do armazenamento colunar (Parquet particionado por id_ticker e mês)
+store_path = r"dados_parquet"
 
-dataframes = []  # Lista para armazenar os dataframes
+# Marca d'água por ticker (último date/time exportado); arquivos com "_" são ignorados na leitura
+watermark_path = os.path.join(store_path, "_watermarks.json")
 
-for month, params in config.items():
-    start_date = params["start_date"]
-    end_date = params["end_date"]
-    id_tickers = params["id_tickers"]
+# Caminho do CSV único (opcional)
+output_path = r"dados.csv"
 
-    # Query para filtrar os dados
-    query = f"""
-    SELECT *
-    FROM Price5
-    WHERE date BETWEEN ? AND ?
-      AND id_ticker IN ({','.join(['?'] * len(id_tickers))})
-    """
-    
-    # Executa a consulta
-    df = pd.read_sql_query(query, conn, params=(start_date, end_date, *id_tickers))
-    df["month"] = month  # Adiciona uma coluna indicando o mês
-    dataframes.append(df)  # Adiciona o dataframe à lista
+# Ordem das colunas do CSV, igual à tabela Price5
+CSV_COLUMNS = ["id_ticker", "date", "time", "open", "close", "high", "low",
+               "average", "volume", "business", "amount_stock"]
 
-# Fecha a conexão com o banco de dados
-conn.close()
 
-# Concatena todos os dataframes e ordena por data
-final_df = pd.concat(dataframes).sort_values(by="date")
+def connect_readonly(path):
+    uri = 'file:' + pathname2url(os.path.abspath(path)) + '?mode=ro'
+    return sqlite3.connect(uri, uri=True)
 
-final_df = final_df.drop(columns=["month"])
 
-# Caminho do arquivo de saída
-output_path = r"dados.csv"
+def export_serial(gerar_csv=False):
+    # Conexão com o banco de dados
+    conn = sqlite3.connect(db_path)
+
+    dataframes = []  # Lista para armazenar os dataframes
+
+    for month, params in config.items():
+        start_date = params["start_date"]
+        end_date = params["end_date"]
+        id_tickers = params["id_tickers"]
+
+        # Query para filtrar os dados
+        query = f"""
+        SELECT *
+        FROM Price5
+        WHERE date BETWEEN ? AND ?
+          AND id_ticker IN ({','.join(['?'] * len(id_tickers))})
+        """
+
+        # Executa a consulta
+        df = pd.read_sql_query(query, conn, params=(start_date, end_date, *id_tickers))
+        df["month"] = month  # Adiciona uma coluna indicando o mês
+        dataframes.append(df)  # Adiciona o dataframe à lista
+
+    # Fecha a conexão com o banco de dados
+    conn.close()
+
+    # Concatena todos os dataframes e ordena por data
+    final_df = pd.concat(dataframes).sort_values(by="date")
+
+    final_df = final_df.drop(columns=["month"])
+
+    # Salva cada partição (id_ticker, mês) com colunas tipadas
+    paths = write_store(final_df, store_path)
+    print(f"{len(paths)} partições gravadas em: {store_path}")
+    update_watermarks(last_exported(final_df))
+
+    # O CSV único continua disponível para quem ainda depende dele
+    if gerar_csv:
+        final_df.to_csv(output_path, index=False)
+        print(f"Arquivo único gerado: {output_path}")
+
+
+def export_partition(task):
+    # Executado em um processo do pool: cada (mês, ticker) tem sua própria conexão e seu arquivo
+    month, start_date, end_date, id_ticker = task
+    conn = connect_readonly(db_path)
+    try:
+        # Já sai ordenada do banco (índice id_ticker, date, time), então não há sort global depois
+        df = pd.read_sql_query(
+            "SELECT * FROM Price5 WHERE id_ticker = ? AND date BETWEEN ? AND ? ORDER BY date, time",
+            conn, params=(id_ticker, start_date, end_date)
+        )
+    finally:
+        conn.close()
+    if df.empty:
+        return None
+    write_partition(df, store_path, id_ticker, month)
+    return month, id_ticker, len(df), (df["date"].iloc[-1], df["time"].iloc[-1])
+
+
+def merge_partitions_to_csv(partitions):
+    # Intercala partições já ordenadas: mês a mês (intervalos disjuntos) e, dentro do mês,
+    # um merge estável dos tickers pelo datetime; o CSV é escrito em blocos, sem juntar tudo
+    months = sorted({m for m, _ in partitions}, key=lambda m: config[m]["start_date"])
+    header = True
+    for month in months:
+        parts = []
+        for m, id_ticker in sorted(partitions):
+            if m != month:
+                continue
+            part = pq.read_table(partition_path(store_path, id_ticker, month)).to_pandas()
+            part.insert(0, "id_ticker", id_ticker)
+            parts.append(part)
+        # mergesort detecta as sequências já ordenadas de cada partição e apenas as intercala
+        df = pd.concat(parts, ignore_index=True).sort_values("datetime", kind="mergesort")
+        df["date"] = df["datetime"].dt.strftime("%Y-%m-%d")
+        df["time"] = df["datetime"].dt.strftime("%H:%M:%S")
+        df[CSV_COLUMNS].to_csv(output_path, index=False, header=header, mode="w" if header else "a")
+        header = False
+    print(f"Arquivo único gerado: {output_path}")
+
+
+def export_parallel(gerar_csv=False, workers=None):
+    tasks = [
+        (month, params["start_date"], params["end_date"], id_ticker)
+        for month, params in config.items()
+        for id_ticker in params["id_tickers"]
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = [r for r in executor.map(export_partition, tasks) if r is not None]
+
+    print(f"{len(results)} partições gravadas em: {store_path}")
+    last = {}
+    for _, id_ticker, _, mark in results:
+        last[id_ticker] = max(last.get(id_ticker, mark), mark)
+    update_watermarks(last)
+    if gerar_csv:
+        merge_partitions_to_csv([(month, id_ticker) for month, id_ticker, _, _ in results])
+
+
+def load_watermarks():
+    if not os.path.exists(watermark_path):
+        return {}
+    with open(watermark_path) as f:
+        return {int(k): tuple(v) for k, v in json.load(f).items()}
+
+
+def save_watermarks(watermarks):
+    os.makedirs(store_path, exist_ok=True)
+    tmp_path = watermark_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({str(k): list(v) for k, v in sorted(watermarks.items())}, f, indent=2)
+    os.replace(tmp_path, watermark_path)
+
+
+def last_exported(df):
+    # {id_ticker: (date, time)} da última linha exportada de cada ticker
+    last = df.sort_values(["id_ticker", "date", "time"], kind="mergesort").drop_duplicates("id_ticker", keep="last")
+    return {int(row.id_ticker): (row.date, row.time) for row in last.itertuples(index=False)}
+
+
+def update_watermarks(last):
+    # Depois de uma exportação completa, a próxima incremental parte do que acabou de ser gravado
+    watermarks = load_watermarks()
+    watermarks.update(last)
+    save_watermarks(watermarks)
+
+
+def export_incremental():
+    # Busca só as linhas a partir da marca d'água de cada ticker, dentro dos meses em que o ticker
+    # aparece no config, e acrescenta nas partições. A própria linha da marca é buscada de novo (>=)
+    # para cobrir um último candle regravado no banco depois da exportação anterior; se ela veio
+    # sozinha e igual à gravada, a partição não é reescrita. Só as linhas posteriores à marca contam
+    # como novas. Sem marca d'água, só a seleção (mês, ticker) do config é exportada.
+    watermarks = load_watermarks()
+    ranges = {}
+    for month, params in config.items():
+        for id_ticker in params["id_tickers"]:
+            ranges.setdefault(id_ticker, []).append((month, params["start_date"], params["end_date"]))
+
+    conn = connect_readonly(db_path)
+    try:
+        for id_ticker, months in sorted(ranges.items()):
+            mark = watermarks.get(id_ticker, ("", ""))
+            rows = 0
+            updated = False
+            for month, start_date, end_date in sorted(months, key=lambda m: m[1]):
+                if mark[0] > end_date:
+                    continue
+                df = pd.read_sql_query(
+                    "SELECT * FROM Price5 WHERE id_ticker = ? AND date BETWEEN ? AND ? AND (date, time) >= (?, ?)"
+                    " ORDER BY date, time",
+                    conn, params=(id_ticker, start_date, end_date, *mark)
+                )
+                newer = int(((df["date"] > mark[0]) | ((df["date"] == mark[0]) & (df["time"] > mark[1]))).sum())
+                if df.empty or (newer == 0 and partition_has_rows(df, store_path, id_ticker, month)):
+                    continue
+                append_partition(df, store_path, id_ticker, month)
+                watermarks[id_ticker] = (df["date"].iloc[-1], df["time"].iloc[-1])
+                rows += newer
+                updated = True
+
+            if rows:
+                print(f"Ticker {id_ticker}: {rows} linhas até {watermarks[id_ticker][0]} {watermarks[id_ticker][1]}")
+            elif updated:
+                print(f"Ticker {id_ticker}: linha de {mark[0]} {mark[1]} atualizada")
+            else:
+                print(f"Ticker {id_ticker}: nada novo desde {mark[0] or 'o início'} {mark[1]}")
+    finally:
+        conn.close()
+
+    save_watermarks(watermarks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta o Price5 para o armazenamento Parquet")
+    parser.add_argument("--modo", choices=["serial", "paralelo", "incremental"], default="paralelo")
+    parser.add_argument("--csv", action="store_true", help="gera também o dados.csv único")
+    parser.add_argument("--workers", type=int, default=None, help="processos (padrão: núcleos)")
+    args = parser.parse_args()
 
-# Salva o dataframe em um único arquivo CSV
-final_df.to_csv(output_path, index=False)
-print(f"Arquivo único gerado: {output_path}")
-print("Processo concluído.")
+    if args.modo == "serial":
+        export_serial(gerar_csv=args.csv)
+    elif args.modo == "incremental":
+        export_incremental()
+    else:
+        export_parallel(gerar_csv=args.csv, workers=args.workers)
+    print("Processo concluído.")
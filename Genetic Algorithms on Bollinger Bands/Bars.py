@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from Resampler import aggregate_bins, sorted_rows, time_bins
+
+# Barras construídas direto das linhas do price5, em uma passada vetorizada por ticker:
+#  - 'time':   grade fixa de tempo ancorada na meia-noite de cada dia (size = '15min', '60min', ...);
+#  - 'volume': cada barra fecha ao acumular `size` ações (amount_stock);
+#  - 'dollar': cada barra fecha ao acumular `size` em financeiro (average × amount_stock).
+# O resultado segue o formato de candles do DataProcessor (índice datetime = início da barra, colunas
+# id_ticker/open/close/high/low/volume, ordenado por (datetime, id_ticker)) e acrescenta
+# amount_stock, business e vwap = Σ(average × amount_stock) / Σ amount_stock. A ordenação e a
+# agregação são as mesmas do Resampler; aqui só muda a numeração das barras.
+BAR_KINDS = ('time', 'volume', 'dollar')
+BAR_COLUMNS = ('open', 'close', 'high', 'low', 'volume', 'average', 'business', 'amount_stock')
+
+
+def _check_size(kind, size):
+    # 'time' pede uma duração ('15min', pd.Timedelta, datetime.timedelta, ...); 'volume' e 'dollar'
+    # pedem um número positivo
+    # (np.timedelta64 herda de np.integer, mas é uma duração)
+    number = (isinstance(size, (int, float, np.integer, np.floating))
+              and not isinstance(size, (bool, np.timedelta64)))
+    if kind == 'time':
+        try:
+            width = None if number else pd.Timedelta(size)
+        except (TypeError, ValueError):
+            width = None
+        if width is None or pd.isna(width) or width <= pd.Timedelta(0):
+            raise ValueError(f"Time bars need a positive duration as size (e.g. '15min'), got {size!r}.")
+    elif not number or not np.isfinite(size) or size <= 0:
+        raise ValueError(f"{kind.capitalize()} bars need a positive number as size, got {size!r}.")
+
+
+def _bar_ids(kind, size, ts, ticker, weight):
+    # Número da barra de cada linha: grade de tempo, ou acumulado de `weight` antes da linha (zerado no
+    # início de cada ticker) dividido por size
+    if kind == 'time':
+        return time_bins(ts, size)
+    cum = np.cumsum(weight)
+    before = cum - weight
+    ticker_start = np.flatnonzero(np.append(True, ticker[1:] != ticker[:-1]))
+    offset = np.repeat(before[ticker_start], np.diff(np.append(ticker_start, len(ts))))
+    return (before - offset) // size
+
+
+def build_bars(df, kind='time', size='5min'):
+    if kind not in BAR_KINDS:
+        raise ValueError(f"Bar kind {kind} not supported. Choose from {', '.join(BAR_KINDS)}.")
+    _check_size(kind, size)
+    missing = [name for name in BAR_COLUMNS if name not in df.columns]
+    if missing:
+        raise ValueError(f"Bars need the price5 columns {', '.join(missing)}.")
+    has_ticker = 'id_ticker' in df.columns
+    columns = (['id_ticker'] if has_ticker else []) + ['open', 'close', 'high', 'low', 'volume',
+                                                       'amount_stock', 'business', 'vwap']
+
+    df = df.dropna(subset=list(BAR_COLUMNS))
+    if df.empty:
+        return pd.DataFrame({name: [] for name in columns}, index=pd.DatetimeIndex([], name=df.index.name))
+
+    ts, ticker, values = sorted_rows(df, BAR_COLUMNS)
+    amount = values['amount_stock'] = values['amount_stock'].astype('int64')
+    # Financeiro de cada linha, somado por barra para o VWAP (average não entra no resultado)
+    notional = values['notional'] = values.pop('average').astype('float64') * amount
+    bar = _bar_ids(kind, size, ts, ticker, amount if kind == 'volume' else notional)
+
+    # Rótulo: início da grade (barras de tempo) ou horário da primeira linha (volume/financeiro)
+    bars = aggregate_bins(ticker, values, bar, bar if kind == 'time' else ts, columns[:-1] + ['notional'],
+                          df.index.name)
+    bar_notional = bars.pop('notional').to_numpy()
+    bar_amount = bars['amount_stock'].to_numpy()
+    bars['vwap'] = np.divide(bar_notional, bar_amount, out=np.full(len(bars), np.nan), where=bar_amount > 0)
+    return bars
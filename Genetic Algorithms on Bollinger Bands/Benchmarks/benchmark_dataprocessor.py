@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+try:
+    import resource  # só existe em Unix
+except ImportError:
+    resource = None
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from BovDB import close_pools, ensure_price5_index, tickers
+from DataProcessor import DataProcessor
+
+# Mede load_data, process_data, identify_*_candles e detectar_topos_fundos_60_min sobre bancos
+# price5 sintéticos (dias úteis, candles de 5 minutos das 10:00 às 17:55, passeio aleatório em ticks).
+# Cada etapa de candles roda com a pirâmide invalidada, ou seja, inclui a própria reamostragem.
+# Cada caso roda duas vezes: os tempos vêm de uma passada sem tracemalloc (que deixa o Python 3 a 5
+# vezes mais lento) e o pico de memória Python/NumPy de uma segunda passada rastreada. max_rss_mb é o
+# pico de RSS do processo ao fim da etapa, que inclui também a memória do próprio SQLite.
+
+PRICE5_SCHEMA = """
+CREATE TABLE price5 (id_ticker INTEGER, date TEXT, time TEXT, open INTEGER, close INTEGER, high INTEGER,
+                     low INTEGER, average REAL, volume REAL, business INTEGER, amount_stock INTEGER)
+"""
+FIRST_DAY = '2020-01-01'
+FIRST_TICKER = 1000
+
+
+def synthetic_price5(n_tickers, n_days, seed=0):
+    # Linhas do price5 para n_tickers ao longo de n_days dias úteis
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(FIRST_DAY, periods=n_days)
+    minutes = pd.timedelta_range('10:00:00', '17:55:00', freq='5min')
+    stamps = (days.values[:, None] + minutes.values[None, :]).ravel()
+    n = len(stamps)
+
+    frames = []
+    for k in range(n_tickers):
+        close = 10_000 + np.cumsum(rng.integers(-5, 6, n))
+        open_ = np.append(close[0], close[:-1])
+        spread = rng.integers(0, 4, (2, n))
+        amount = rng.integers(100, 10_000, n)
+        frames.append(pd.DataFrame({
+            'id_ticker': FIRST_TICKER + k,
+            'date': pd.DatetimeIndex(stamps).strftime('%Y-%m-%d'),
+            'time': pd.DatetimeIndex(stamps).strftime('%H:%M:%S'),
+            'open': open_,
+            'close': close,
+            'high': np.maximum(open_, close) + spread[0],
+            'low': np.minimum(open_, close) - spread[1],
+            'average': (open_ + close) / 2,
+            'volume': (open_ + close) / 2 * amount,
+            'business': rng.integers(1, 200, n),
+            'amount_stock': amount,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_price5_db(path, n_tickers, n_days, seed=0):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(PRICE5_SCHEMA)
+        rows = synthetic_price5(n_tickers, n_days, seed)
+        conn.executemany("INSERT INTO price5 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         rows.itertuples(index=False, name=None))
+        conn.commit()
+    finally:
+        conn.close()
+    ensure_price5_index(path)
+    return path
+
+
+def max_rss_mb():
+    # Pico de RSS do processo até agora (None fora do Unix); ru_maxrss vem em KB no Linux e em bytes no macOS
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == 'darwin' else rss / 2**10
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return {'wall_s': time.perf_counter() - start, 'max_rss_mb': max_rss_mb()}
+
+
+def traced(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'peak_mb': peak / 2**20}
+
+
+def run_stages(db_path, n_tickers, n_days, probe):
+    # Executa as etapas em ordem, medindo cada uma com probe(fn); devolve ({etapa: medidas}, linhas)
+    last_day = pd.bdate_range(FIRST_DAY, periods=n_days)[-1].strftime('%Y-%m-%d')
+    query = tickers(range(FIRST_TICKER, FIRST_TICKER + n_tickers)).between(FIRST_DAY, last_day)
+    processor = DataProcessor(db_path, query)
+
+    results = {'load_data': probe(processor.load_data)}
+    rows = len(processor.df)
+    results['process_data'] = probe(processor.process_data)
+    for stage, fn in [
+        ('identify_5_min_candles', processor.identify_5_min_candles),
+        ('identify_60_min_candles', processor.identify_60_min_candles),
+        ('detectar_topos_fundos_60_min', processor.detectar_topos_fundos_60_min),
+    ]:
+        processor.invalidate_candles()
+        results[stage] = probe(fn)
+    return results, rows
+
+
+def run_case(db_path, n_tickers, n_days):
+    timings, rows = run_stages(db_path, n_tickers, n_days, timed)
+    memory, _ = run_stages(db_path, n_tickers, n_days, traced)
+    results = []
+    for stage, r in timings.items():
+        r = {'stage': stage, **r, **memory[stage]}
+        r.update({'tickers': n_tickers, 'days': n_days, 'rows': rows,
+                  'rows_per_s': rows / r['wall_s'] if r['wall_s'] > 0 else None})
+        results.append(r)
+    return results
+
+
+def run_suite(days, tickers_list, workdir, seed=0):
+    report = {
+        'generated_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': [],
+    }
+    for n_tickers in tickers_list:
+        for n_days in days:
+            db_path = os.path.join(workdir, f'price5_{n_tickers}t_{n_days}d.db')
+            make_price5_db(db_path, n_tickers, n_days, seed)
+            for r in run_case(db_path, n_tickers, n_days):
+                report['results'].append(r)
+                rss = '' if r['max_rss_mb'] is None else f" {r['max_rss_mb']:>9.1f} MB RSS"
+                print(f"{n_tickers:>4} tickers {n_days:>5} dias {r['rows']:>10} linhas  {r['stage']:<30}"
+                      f"{r['wall_s']:>9.3f} s {r['peak_mb']:>9.1f} MB{rss}")
+            close_pools()
+            os.remove(db_path)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark das etapas do DataProcessor em bancos sintéticos')
+    parser.add_argument('--days', type=int, nargs='+', default=[1, 21, 252, 756], help='dias úteis por banco')
+    parser.add_argument('--tickers', type=int, nargs='+', default=[1, 10, 100], help='tickers por banco')
+    parser.add_argument('--output', default='benchmark_dataprocessor.json', help='relatório JSON')
+    parser.add_argument('--workdir', default=None, help='onde criar os bancos (padrão: diretório temporário)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run_suite(args.days, args.tickers, args.workdir or tmp, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Relatório salvo em {args.output}")
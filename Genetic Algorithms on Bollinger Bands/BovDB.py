@@ -0,0 +1,365 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+import numpy as np
+import pandas as pd
+
+# Índice composto usado por todas as consultas do price5 (filtro por ticker + intervalo de datas)
+PRICE5_INDEX = 'idx_price5_ticker_date_time'
+PRICE5_INDEX_COLUMNS = ('id_ticker', 'date', 'time')
+
+# Tipo de cada coluna numérica do price5 (mesmo esquema compacto do candle_store: preços em
+# ticks int32, contadores int32); date/time viram datetime64/timedelta64 em vez de texto.
+# Colunas inteiras com NULL no bloco viram float64 (NaN); colunas fora desta lista passam sem conversão
+PRICE5_DTYPES = {
+    'id_ticker': 'int32',
+    'open': 'int32',
+    'close': 'int32',
+    'high': 'int32',
+    'low': 'int32',
+    'average': 'float64',
+    'volume': 'float64',
+    'business': 'int32',
+    'amount_stock': 'int64',
+    'ts': 'int64',
+}
+
+# Início do pregão: candles anteriores são descartados já na consulta
+SESSION_START = '09:00:00'
+
+# Timestamp em segundos (epoch) calculado pelo próprio SQLite a partir de date + time
+TS_EXPRESSION = "CAST(strftime('%s', {alias}date || ' ' || {alias}time) AS INTEGER)"
+
+CHUNKSIZE = 50_000
+
+# Quantidade de conexões mantidas abertas por banco e de comandos preparados em cache por conexão
+POOL_SIZE = 4
+STATEMENT_CACHE = 256
+
+
+def connect_readonly(db_path, check_same_thread=True):
+    # Abre o banco apenas para leitura (o arquivo nunca é criado nem travado para escrita)
+    uri = 'file:' + pathname2url(os.path.abspath(db_path)) + '?mode=ro'
+    return sqlite3.connect(uri, uri=True, check_same_thread=check_same_thread,
+                           cached_statements=STATEMENT_CACHE)
+
+
+def enable_wal(db_path):
+    # Coloca o banco em modo WAL (uma vez, com acesso de escrita): leitores não bloqueiam escritores
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def has_price5_index(conn):
+    # Verifica se existe algum índice do price5 que comece por (id_ticker, date, time)
+    for _, name, *_ in conn.execute("PRAGMA index_list('price5')").fetchall():
+        columns = tuple(row[2] for row in conn.execute(f"PRAGMA index_info('{name}')").fetchall())
+        if columns[:len(PRICE5_INDEX_COLUMNS)] == PRICE5_INDEX_COLUMNS:
+            return True
+    return False
+
+
+def ensure_price5_index(db_path):
+    # Cria o índice composto caso ele ainda não exista (precisa de acesso de escrita)
+    conn = sqlite3.connect(db_path)
+    try:
+        if not has_price5_index(conn):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {PRICE5_INDEX} ON price5 (id_ticker, date, time)")
+            conn.execute("ANALYZE price5")
+            conn.commit()
+            print(f"Índice {PRICE5_INDEX} criado em {db_path}")
+    finally:
+        conn.close()
+
+
+def session_query(query, start=SESSION_START, end=None):
+    # Envolve a consulta original: filtro de horário do pregão no SQL e coluna ts pronta.
+    # O SQLite achata a subconsulta, então o índice (id_ticker, date, time) continua sendo usado.
+    query = query.strip().rstrip(';')
+    sql = f"SELECT q.*, {TS_EXPRESSION.format(alias='q.')} AS ts FROM ({query}) AS q WHERE q.time >= ?"
+    params = [start]
+    if end is not None:
+        sql += " AND q.time < ?"
+        params.append(end)
+    return sql, params
+
+
+PRICE5_COLUMNS = ('id_ticker', 'date', 'time', 'open', 'close', 'high', 'low',
+                  'average', 'volume', 'business', 'amount_stock')
+
+# Seleção padrão do Query: date/time ficam de fora porque ts já traz data e horário (podem ser
+# pedidos em columns())
+DEFAULT_COLUMNS = tuple(name for name in PRICE5_COLUMNS if name not in ('date', 'time'))
+
+
+def _clock(value):  # '09:00' -> '09:00:00' (o price5 guarda time como texto HH:MM:SS)
+    return value if value.count(':') == 2 else value + ':00'
+
+
+class Query:
+    # Consulta preguiçosa ao price5: cada método devolve uma nova Query e nada é executado
+    # até compile(). Ex.: tickers([2952]).between('2024-02-01', '2024-03-31').session('09:00')
+    def __init__(self, branches=((None, None),), session_range=None, selected=None):
+        self.branches = tuple(branches)  # ((id_tickers, (start, end)), ...) unidos com UNION ALL
+        self.session_range = session_range
+        self.selected = selected
+
+    def _replace(self, **changes):
+        values = dict(branches=self.branches, session_range=self.session_range, selected=self.selected)
+        values.update(changes)
+        return Query(**values)
+
+    def _single_branch(self):
+        if len(self.branches) != 1:
+            raise ValueError("tickers()/between() must be applied before combining queries with |")
+        return self.branches[0]
+
+    def tickers(self, id_tickers):
+        _, date_range = self._single_branch()
+        return self._replace(branches=((tuple(int(t) for t in id_tickers), date_range),))
+
+    def between(self, start, end):
+        id_tickers, _ = self._single_branch()
+        return self._replace(branches=((id_tickers, (str(start), str(end))),))
+
+    def session(self, start, end=None):
+        return self._replace(session_range=(_clock(start), None if end is None else _clock(end)))
+
+    def columns(self, columns):
+        unknown = set(columns) - set(PRICE5_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown price5 columns: {sorted(unknown)}")
+        return self._replace(selected=tuple(columns))
+
+    def __or__(self, other):
+        if self.session_range != other.session_range or self.selected != other.selected:
+            raise ValueError("Combined queries must share session() and columns()")
+        return self._replace(branches=self.branches + other.branches)
+
+    def compile(self):
+        # Gera um único SQL parametrizado; cada ramo usa o índice (id_ticker, date, time)
+        columns = self.selected or DEFAULT_COLUMNS
+        if 'id_ticker' not in columns:
+            columns = ('id_ticker',) + tuple(columns)
+        select = ', '.join(columns) + f", {TS_EXPRESSION.format(alias='')} AS ts"
+
+        parts, params = [], []
+        for id_tickers, date_range in self.branches:
+            where = []
+            if id_tickers:
+                where.append(f"id_ticker IN ({', '.join('?' * len(id_tickers))})")
+                params.extend(id_tickers)
+            if date_range:
+                where.append("date BETWEEN ? AND ?")
+                params.extend(date_range)
+            if self.session_range:
+                where.append("time >= ?")
+                params.append(self.session_range[0])
+                if self.session_range[1] is not None:
+                    where.append("time < ?")
+                    params.append(self.session_range[1])
+            sql = f"SELECT {select} FROM price5"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            parts.append(sql)
+        return " UNION ALL ".join(parts), params
+
+    def __repr__(self):
+        return f"Query({self.compile()[0]!r})"
+
+
+def tickers(id_tickers):
+    return Query().tickers(id_tickers)
+
+
+def _typed_column(name, values):
+    if name == 'date':
+        return pd.to_datetime(np.asarray(values, dtype=object), format='%Y-%m-%d')
+    if name == 'time':
+        return pd.to_timedelta(np.asarray(values, dtype=object))
+    if name not in PRICE5_DTYPES:
+        return list(values)
+    try:
+        return np.asarray(values, dtype=PRICE5_DTYPES[name])
+    except TypeError:
+        # NULL em coluna inteira: mesmo resultado do read_sql_query (float64 com NaN)
+        return np.asarray(values, dtype='float64')
+
+
+def _typed_chunk(rows, columns):
+    # Converte um bloco de tuplas do cursor em colunas tipadas (colunas do price5 sem dtype object).
+    # Com ts completo no bloco, date/time saem do próprio ts em vez de converter o texto linha a linha.
+    values = dict(zip(columns, zip(*rows))) if rows else {name: () for name in columns}
+    typed = {'ts': _typed_column('ts', values['ts'])} if 'ts' in values else {}
+    if 'ts' in typed and typed['ts'].dtype.kind == 'i' and ('date' in values or 'time' in values):
+        ts = typed['ts'].astype('datetime64[s]')
+        day = ts.astype('datetime64[D]')
+        typed['date'] = day.astype('datetime64[ns]')
+        typed['time'] = (ts - day).astype('timedelta64[ns]')
+    for name in columns:
+        if name not in typed:
+            typed[name] = _typed_column(name, values[name])
+    return pd.DataFrame({name: typed[name] for name in columns})
+
+
+def iter_price5(conn, query, params=(), chunksize=CHUNKSIZE):
+    # Executa a consulta e entrega o resultado em blocos tipados de até `chunksize` linhas
+    cursor = conn.execute(query, params)
+    columns = [d[0] for d in cursor.description]
+    yielded = False
+    while True:
+        rows = cursor.fetchmany(chunksize)
+        if not rows:
+            break
+        yielded = True
+        yield _typed_chunk(rows, columns)
+    if not yielded:
+        yield _typed_chunk([], columns)
+
+
+def read_price5(conn, query, params=(), chunksize=CHUNKSIZE):
+    return pd.concat(iter_price5(conn, query, params, chunksize), ignore_index=True)
+
+
+class ConnectionPool:
+    # Conexões somente leitura reaproveitadas entre cargas; checkout/checkin seguro entre threads.
+    # Cada conexão mantém seu cache de comandos preparados e de páginas, então consultas
+    # parametrizadas repetidas não pagam abertura do arquivo nem novo prepare.
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self.index_ok = None
+        self.journal_mode = None
+
+    def _new_connection(self):
+        conn = connect_readonly(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if self.index_ok is None:
+            self.index_ok = has_price5_index(conn)
+        return conn
+
+    def _take_idle(self, block):
+        conn = self._idle.get() if block else self._idle.get_nowait()
+        if conn is None:
+            # Sentinela de close(): repassa para os outros que estiverem esperando
+            self._idle.put(None)
+            raise sqlite3.ProgrammingError(f"Connection pool for {self.db_path} is closed.")
+        return conn
+
+    def acquire(self):
+        try:
+            return self._take_idle(block=False)
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError(f"Connection pool for {self.db_path} is closed.")
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._new_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        # Pool cheio: espera alguma conexão ser devolvida
+        return self._take_idle(block=True)
+
+    def release(self, conn):
+        # Depois de close(), a conexão devolvida é fechada em vez de voltar para o pool
+        with self._lock:
+            closed = self._closed
+            if closed:
+                self._created -= 1
+        if closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def enable_wal(self):
+        # Modo WAL uma vez por pool (abre o arquivo com escrita só para o PRAGMA)
+        if self.journal_mode != 'wal':
+            self.journal_mode = enable_wal(self.db_path)
+        return self.journal_mode
+
+    def close(self):
+        # Fecha as conexões ociosas agora e as emprestadas quando forem devolvidas
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if conn is not None:
+                    conn.close()
+                    self._created -= 1
+            # Acorda quem estiver esperando uma conexão em acquire()
+            self._idle.put(None)
+
+
+class Session:
+    # Fachada sobre o pool: executa consultas parametrizadas e devolve dataframes tipados
+    def __init__(self, pool):
+        self.pool = pool
+
+    def read(self, query, params=(), chunksize=CHUNKSIZE):
+        with self.pool.connection() as conn:
+            return read_price5(conn, query, params, chunksize)
+
+    def iter(self, query, params=(), chunksize=CHUNKSIZE):
+        with self.pool.connection() as conn:
+            yield from iter_price5(conn, query, params, chunksize)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, size=POOL_SIZE):
+    # Um pool por arquivo de banco, compartilhado por todos os DataProcessor do processo
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path, size)
+        return pool
+
+
+def get_session(db_path, wal=False):
+    # Sessão sobre o pool compartilhado do banco; wal=True coloca o arquivo em modo WAL antes
+    pool = get_pool(db_path)
+    if wal:
+        pool.enable_wal()
+    return Session(pool)
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
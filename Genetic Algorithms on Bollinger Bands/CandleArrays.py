@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Layout em disco, um diretório por ticker com um .npy contíguo por campo:
+#   <root>/<id_ticker>/ts.npy (int64, ns desde epoch), open.npy, high.npy, low.npy, close.npy, volume.npy
+# Os arquivos são abertos com mmap, então processos diferentes compartilham a mesma cópia física.
+FIELDS = ('ts', 'open', 'high', 'low', 'close', 'volume')
+
+
+class CandleArrays:
+    # Candles de um único ticker como arrays NumPy paralelos (ordenados por ts)
+    def __init__(self, id_ticker, ts, open, high, low, close, volume):
+        self.id_ticker = id_ticker
+        self.ts = ts
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __len__(self):
+        return len(self.ts)
+
+    @property
+    def index(self):
+        # DatetimeIndex sobre o mesmo buffer de ts (sem cópia)
+        return pd.DatetimeIndex(self.ts.view('datetime64[ns]'))
+
+    def positions(self, timestamps):
+        # Posição de cada timestamp nos arrays (-1 quando o timestamp não pertence a este ticker)
+        t = pd.DatetimeIndex(list(timestamps)).asi8 if len(timestamps) else np.empty(0, dtype='int64')
+        pos = np.searchsorted(self.ts, t)
+        found = pos < len(self.ts)
+        found[found] = self.ts[pos[found]] == t[found]
+        return np.where(found, pos, -1)
+
+    def between(self, start, end):
+        # Candles com start <= ts < end como fatias dos mesmos arrays (continua zero-copy sobre o mmap)
+        lo, hi = np.searchsorted(self.ts, [pd.Timestamp(start).value, pd.Timestamp(end).value])
+        return CandleArrays(self.id_ticker, *(getattr(self, field)[lo:hi] for field in FIELDS))
+
+    def to_frame(self):
+        return pd.DataFrame({f: getattr(self, f) for f in FIELDS[1:]}, index=self.index)
+
+
+def from_frame(df, id_ticker=None):
+    # Converte um dataframe de candles (índice datetime) em arrays contíguos
+    df = df.sort_index(kind='mergesort')
+    return CandleArrays(
+        id_ticker,
+        np.ascontiguousarray(df.index.asi8, dtype='int64'),
+        *(np.ascontiguousarray(df[f].to_numpy()) for f in FIELDS[1:])
+    )
+
+
+def save_candle_arrays(candles_by_ticker, root):
+    # Grava {id_ticker: dataframe de candles} no layout de arrays por ticker
+    for id_ticker, df in candles_by_ticker.items():
+        arrays = df if isinstance(df, CandleArrays) else from_frame(df, id_ticker)
+        directory = os.path.join(root, str(id_ticker))
+        os.makedirs(directory, exist_ok=True)
+        for field in FIELDS:
+            np.save(os.path.join(directory, f'{field}.npy'), getattr(arrays, field))
+    return root
+
+
+def attach(root, id_ticker):
+    # Abre os arrays de um ticker mapeados em memória, somente leitura (zero-copy)
+    directory = os.path.join(root, str(id_ticker))
+    return CandleArrays(
+        id_ticker,
+        *(np.load(os.path.join(directory, f'{field}.npy'), mmap_mode='r') for field in FIELDS)
+    )
+
+
+def attach_all(root):
+    tickers = sorted(int(name) for name in os.listdir(root) if name.isdigit())
+    return {id_ticker: attach(root, id_ticker) for id_ticker in tickers}
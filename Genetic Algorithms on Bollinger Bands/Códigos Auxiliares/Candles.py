@@ -1,39 +1,14 @@
-import sqlite3
-import pandas as pd
-import plotly.graph_objects as go
-
-class DataProcessor:
-    def __init__(self, db_path, query):
-        self.db_path = db_path
-        self.query = query
-        self.df = None
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    def load_data(self):
-        # Conectar ao banco de dados e carregar os dados
-        conn = sqlite3.connect(self.db_path)
-        self.df = pd.read_sql_query(self.query, conn)
-        conn.close()
+import plotly.graph_objects as go
 
-    def process_data(self):
-        # Criar uma nova coluna de datetime combinando data e hora
-        self.df['datetime'] = pd.to_datetime(self.df['date'] + ' ' + self.df['time'], format='%Y-%m-%d %H:%M:%S')
-        # Configurar datetime como índice
-        self.df.set_index('datetime', inplace=True)
-        # Filtrar os dados para incluir apenas a partir das 09:00:00
-        self.df = self.df[self.df.index.time >= pd.to_datetime('09:00:00').time()]
-        return self.df
+import DataProcessor as base
+from BovDB import tickers
 
-    def identify_5_min_candles(self):
-        # Reamostragem para manter os candles de 5 minutos
-        df_5min = self.df.resample('5T').agg({
-            'open': 'first',
-            'close': 'last',
-            'high': 'max',
-            'low': 'min',
-            'volume': 'sum'
-        }).dropna()
-        return df_5min
 
+class DataProcessor(base.DataProcessor):
     def calculate_bollinger_bands(self, df, window=20, std_dev=2):
         # Calcular Média Móvel Simples (SMA) e Bandas de Bollinger
         df['SMA'] = df['close'].rolling(window=window).mean()
@@ -87,11 +62,7 @@ def plot_candlestick_with_bollinger(df):
 
 # Exemplo de uso
 db_path = r'C:\\Users\\othav\\BovDB.v2\\Database_define.db'
-query = """
-    SELECT id_ticker, date, time, open, close, high, low, average, volume, business, amount_stock
-    FROM price5
-    WHERE id_ticker = 107 AND date = '2024-06-27'
-    """
+query = tickers([107]).between('2024-06-27', '2024-06-27').session('09:00').columns(['open', 'close', 'high', 'low', 'volume'])
 # Criar uma instância do DataProcessor
 processor = DataProcessor(db_path, query)
 processor.load_data()
@@ -0,0 +1,172 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from Bars import build_bars
+from BovDB import (CHUNKSIZE, PRICE5_INDEX_COLUMNS, SESSION_START, Query, ensure_price5_index, get_session,
+                   session_query)
+from PivotDetector import detect_pivots
+from Resampler import resample_candles
+
+# Agregação OHLCV (equivalente à do Resampler, para quem ainda usa DataFrame.resample)
+CANDLE_AGG = {
+    'open': 'first',
+    'close': 'last',
+    'high': 'max',
+    'low': 'min',
+    'volume': 'sum'
+}
+
+# Níveis da pirâmide de candles; todos acima de 5min são agregados a partir do 5min
+TIMEFRAMES = ('5min', '15min', '30min', '60min')
+
+
+def _pyramid_level(base_5min, timeframe):
+    return base_5min if timeframe == TIMEFRAMES[0] else resample_candles(base_5min, timeframe)
+
+
+def _detect_ticker(task):
+    # Executado em um processo do pool: reamostragem + detector de topos e fundos de um único ticker
+    id_ticker, raw, coarse, fine = task
+    base = resample_candles(raw, TIMEFRAMES[0])
+    return id_ticker, detect_pivots(_pyramid_level(base, coarse), _pyramid_level(base, fine), pd.Timedelta(coarse))
+
+
+def merge_pivots(pivots_by_ticker):
+    # {id_ticker: (topos, fundos, pontos_confirmacao)} -> listas únicas. Cada ticker mantém a ordem em
+    # que o detector emitiu os pontos; entre tickers a intercalação é por horário e, no empate, por id_ticker
+    groups = [pivots_by_ticker[id_ticker] for id_ticker in sorted(pivots_by_ticker)]
+    by_time = lambda ponto: ponto[0]
+    return tuple(list(heapq.merge(*(group[k] for group in groups), key=by_time)) for k in range(3))
+
+
+class DataProcessor:
+    def __init__(self, db_path, query, create_index=False, chunksize=CHUNKSIZE,
+                 session_start=SESSION_START, session_end=None, pivot_cache=None, wal=False):
+        self.db_path = db_path
+        self.query = query
+        self.session_start = session_start
+        self.session_end = session_end
+        self.create_index = create_index
+        self.chunksize = chunksize
+        # wal=True coloca o banco em modo WAL na primeira carga (precisa de acesso de escrita)
+        self.wal = wal
+        # PivotCache opcional: topos e fundos por ticker guardados em disco entre execuções
+        self.pivot_cache = pivot_cache
+        self._pyramid = {}
+        self.df = None
+
+    @property
+    def df(self):
+        return self._df
+
+    @df.setter
+    def df(self, value):
+        # Qualquer novo dataframe invalida a pirâmide de candles calculada
+        self._df = value
+        self._pyramid = {}
+
+    def invalidate_candles(self):
+        # Chamar após alterar self.df no lugar (inplace)
+        self._pyramid = {}
+
+    def candles(self, timeframe='5min'):
+        # Pirâmide de candles memorizada: calculada uma vez por dataset carregado.
+        # O dataframe devolvido é compartilhado; não deve ser alterado por quem chama.
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Interval {timeframe} not supported. Choose from {', '.join(TIMEFRAMES)}.")
+        if timeframe not in self._pyramid:
+            base = self.df if timeframe == TIMEFRAMES[0] else self.candles(TIMEFRAMES[0])
+            # Grade fixa por (id_ticker, pregão): sem candles vazios de noite e sem misturar tickers
+            self._pyramid[timeframe] = resample_candles(base, timeframe)
+        return self._pyramid[timeframe]
+
+    def bars(self, kind='time', size='5min'):
+        # Barras de tempo, volume (ações) ou financeiro construídas das linhas do price5, memorizadas
+        # junto com a pirâmide; exigem as colunas average, business e amount_stock na consulta
+        key = ('bars', kind, size)
+        if key not in self._pyramid:
+            self._pyramid[key] = build_bars(self.df, kind, size)
+        return self._pyramid[key]
+
+    def load_data(self):
+        # Sessão sobre o pool compartilhado (conexões somente leitura, comandos preparados em cache)
+        session = get_session(self.db_path, wal=self.wal)
+        # Garantir o índice (id_ticker, date, time) antes de consultar
+        if self.create_index:
+            ensure_price5_index(self.db_path)
+            session.pool.index_ok = True
+        # Filtro do pregão e coluna ts (epoch em segundos) calculados no próprio banco
+        if isinstance(self.query, Query):
+            query = self.query
+            if query.session_range is None:
+                query = query.session(self.session_start, self.session_end)
+            query, params = query.compile()
+        else:
+            query, params = session_query(self.query, self.session_start, self.session_end)
+        # Leitura em blocos já tipados
+        self.df = session.read(query, params, chunksize=self.chunksize)
+        if session.pool.index_ok is False:
+            print(f"Aviso: price5 sem índice {PRICE5_INDEX_COLUMNS}; use ensure_price5_index({self.db_path!r})")
+
+    def process_data(self):
+        # Converter o timestamp inteiro vindo do banco em datetime64 (sem parsing de texto)
+        self.df['datetime'] = pd.to_datetime(self.df['ts'], unit='s')
+        # Configurar datetime como índice (o filtro das 09:00:00 já foi aplicado na consulta)
+        self.df.set_index('datetime', inplace=True)
+        self.invalidate_candles()
+        return self.df
+
+    def identify_5_min_candles(self):
+        # Candles de 5 minutos (cópia da pirâmide, pode ser alterada por quem chama)
+        return self.candles('5min').copy()
+
+    def candles_by_ticker(self, timeframe='5min'):
+        # Candles separados por id_ticker (a pirâmide já não mistura tickers)
+        candles = self.candles(timeframe)
+        if 'id_ticker' not in candles.columns:
+            return {None: candles}
+        return {
+            id_ticker: group.drop(columns='id_ticker')
+            for id_ticker, group in candles.groupby('id_ticker')
+        }
+
+    def identify_5_min_candles_by_ticker(self):
+        return self.candles_by_ticker('5min')
+    
+    def identify_60_min_candles(self):
+        # Candles de 60 minutos (cópia da pirâmide, pode ser alterada por quem chama)
+        return self.candles('60min').copy()
+
+    def detectar_topos_fundos(self, coarse='60min', fine='5min', workers=1):
+        # Topos e fundos do timeframe maior refinados no menor, ticker a ticker
+        # (nenhuma sequência atravessa a troca de ticker)
+        return merge_pivots(self.detectar_topos_fundos_universo(coarse, fine, workers))
+
+    def detectar_topos_fundos_universo(self, coarse='60min', fine='5min', workers=None):
+        # Resultado por ticker: {id_ticker: (topos, fundos, pontos_confirmacao)}.
+        # Com PivotCache, os dias já conhecidos vêm do disco; sem ele, cada ticker é reamostrado e
+        # processado em um processo do pool (workers=None usa todos os núcleos, workers=1 roda aqui)
+        if self.pivot_cache is not None:
+            return self.pivot_cache.pivots_by_ticker(self.candles_by_ticker(fine), pd.Timedelta(coarse))
+
+        if workers == 1 or 'id_ticker' not in self.df.columns or self.df['id_ticker'].nunique() <= 1:
+            # Um processo só: aproveita a pirâmide memorizada
+            by_ticker_fine = self.candles_by_ticker(fine)
+            by_ticker_coarse = self.candles_by_ticker(coarse)
+            return {
+                id_ticker: detect_pivots(by_ticker_coarse[id_ticker], candles, pd.Timedelta(coarse))
+                for id_ticker, candles in by_ticker_fine.items()
+            }
+
+        columns = ['open', 'close', 'high', 'low', 'volume']
+        tasks = [(id_ticker, raw[columns], coarse, fine) for id_ticker, raw in self.df.groupby('id_ticker')]
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return dict(executor.map(_detect_ticker, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+
+    def detectar_topos_fundos_60_min(self):
+        # Candles de 5 e 60 minutos lidos da pirâmide (sem reamostrar a cada chamada)
+        return self.detectar_topos_fundos('60min', '5min')
@@ -0,0 +1,213 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+
+from RollingStats import RollingStats
+
+# Entradas guardadas pelo FitnessCache (LRU)
+FITNESS_CACHE_SIZE = 4096
+
+# std_fac avaliados por vez na busca em grade (linhas da matriz de comparação)
+GRID_CHUNK = 128
+
+# Peso da penalidade na fitness do AG: fitness = ganho - penalidade * PENALTY_WEIGHT
+PENALTY_WEIGHT = 0.01
+
+
+def bollinger_bands(close, period, std_fac):
+    # Bandas superior e inferior (SMA ± std_fac × desvio amostral) sobre um array de fechamentos
+    return RollingStats(close).bands(period, std_fac)
+
+
+def _locate(candles, pontos):
+    # Posições únicas dos pontos nos arrays do ticker, quantas vezes cada uma aparece e o fechamento
+    # do ponto (pontos de outros tickers, ou fora do intervalo, são ignorados)
+    pos = candles.positions([ponto[0] for ponto in pontos])
+    values = np.array([ponto[1] for ponto in pontos], dtype='float64')
+    found = pos >= 0
+    unique, first, counts = np.unique(pos[found], return_index=True, return_counts=True)
+    return unique, counts, values[found][first]
+
+
+class TickerTargets:
+    # Tudo que não depende de (period, std_fac), calculado uma vez por ticker
+    def __init__(self, candles, topos, fundos):
+        # Fechamentos sem cópia (o mmap int32 de attach é comparado direto; o NumPy promove o tipo na
+        # comparação com as bandas float64)
+        self.close = candles.close
+        # Somas acumuladas (exatas em ticks inteiros) de close e close², montadas uma vez por ticker
+        self.stats = RollingStats(candles.close)
+        self.topo_pos, self.topo_count, self.topo_value = _locate(candles, topos)
+        self.fundo_pos, self.fundo_count, self.fundo_value = _locate(candles, fundos)
+        # Máscara dos candles que não são topo nem fundo (os únicos que podem ser penalizados)
+        self.free = np.ones(len(self.close), dtype=bool)
+        self.free[self.topo_pos] = False
+        self.free[self.fundo_pos] = False
+
+
+class BollingerFitness:
+    # Fitness das Bandas de Bollinger com máscaras NumPy, com a mesma regra do laço original:
+    #  - ganho: topo com fechamento acima da banda superior / fundo abaixo da inferior;
+    #  - penalidade: candle que não é topo nem fundo e fecha fora das bandas.
+    # candles: {id_ticker: CandleArrays}; pivots_by_ticker: {id_ticker: (topos, fundos, pontos_confirmacao)}
+    def __init__(self, candles, pivots_by_ticker):
+        self.targets = {}
+        for id_ticker, c in candles.items():
+            topos, fundos, _ = pivots_by_ticker.get(id_ticker, ([], [], []))
+            self.targets[id_ticker] = TickerTargets(c, topos, fundos)
+        self.fingerprint = self._fingerprint()
+
+    def _fingerprint(self):
+        # Identifica o dataset: fechamentos e topos/fundos de cada ticker
+        digest = hashlib.sha1()
+        for id_ticker, t in self.targets.items():
+            digest.update(str(id_ticker).encode())
+            for array in (t.close, t.topo_pos, t.topo_count, t.topo_value, t.fundo_pos, t.fundo_count, t.fundo_value):
+                digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def detail(self, period, std_fac):
+        # Contagens separadas, incluindo topos/fundos que ficaram dentro das bandas (errados)
+        totals = {'gaintopo': 0, 'gainvale': 0, 'penalty': 0, 'testeTopo': 0, 'testeVale': 0}
+        for t in self.targets.values():
+            upper, lower = t.stats.bands(period, std_fac)
+            upper_at_topo = upper[t.topo_pos]
+            lower_at_fundo = lower[t.fundo_pos]
+            totals['gaintopo'] += int(t.topo_count[t.topo_value > upper_at_topo].sum())
+            totals['gainvale'] += int(t.fundo_count[t.fundo_value < lower_at_fundo].sum())
+            totals['testeTopo'] += int(t.topo_count[t.topo_value < upper_at_topo].sum())
+            totals['testeVale'] += int(t.fundo_count[t.fundo_value > lower_at_fundo].sum())
+            outside = (t.close > upper) | (t.close < lower)
+            totals['penalty'] += int(np.count_nonzero(outside & t.free))
+        return totals
+
+    def score(self, period, std_fac):
+        totals = self.detail(period, std_fac)
+        return totals['gaintopo'] + totals['gainvale'], totals['penalty']
+
+    def fitness(self, period, std_fac):
+        gain, penalty = self.score(period, std_fac)
+        return gain - (penalty * PENALTY_WEIGHT)
+
+    def _period_stats(self, period):
+        # Médias e desvios de um period, calculados uma vez por ticker
+        return [(t,) + t.stats.mean_std(period) for t in self.targets.values()]
+
+    def _score_factors(self, period_stats, std_facs):
+        # Vários std_fac sobre médias/desvios já calculados: todos comparados com os fechamentos em uma
+        # matriz (len(std_facs), candles)
+        factors = np.asarray(std_facs, dtype='float64')[:, None]
+        gains = np.zeros(len(factors), dtype='int64')
+        penalties = np.zeros(len(factors), dtype='int64')
+        for t, sma, std in period_stats:
+            upper_at_topo = sma[t.topo_pos] + (std[t.topo_pos] * factors)
+            lower_at_fundo = sma[t.fundo_pos] - (std[t.fundo_pos] * factors)
+            gains += (t.topo_value > upper_at_topo) @ t.topo_count
+            gains += (t.fundo_value < lower_at_fundo) @ t.fundo_count
+
+            # Penalidade só nos candles livres (nem topo nem fundo)
+            close, sma, band = t.close[t.free], sma[t.free], std[t.free] * factors
+            outside = (close > sma + band) | (close < sma - band)
+            penalties += np.count_nonzero(outside, axis=1)
+        return gains, penalties
+
+    def score_batch(self, periods, std_facs):
+        # Vários pares de uma vez, agrupados por period. Devolve arrays (ganhos, penalidades) na ordem
+        # dos pares, iguais aos de score()
+        periods = np.asarray(periods, dtype='int64')
+        std_facs = np.asarray(std_facs, dtype='float64')
+        gains = np.zeros(len(periods), dtype='int64')
+        penalties = np.zeros(len(periods), dtype='int64')
+        for period in np.unique(periods):
+            rows = np.flatnonzero(periods == period)
+            gains[rows], penalties[rows] = self._score_factors(self._period_stats(period), std_facs[rows])
+        return gains, penalties
+
+    def score_grid(self, periods, std_facs, chunk=GRID_CHUNK):
+        # Todas as combinações: arrays 2-D (len(periods), len(std_facs)) de ganhos e penalidades.
+        # Médias/desvios uma vez por period; só a comparação é feita em blocos de `chunk` std_fac para
+        # limitar a matriz intermediária.
+        std_facs = np.asarray(std_facs, dtype='float64')
+        gains = np.zeros((len(periods), len(std_facs)), dtype='int64')
+        penalties = np.zeros((len(periods), len(std_facs)), dtype='int64')
+        for i, period in enumerate(periods):
+            period_stats = self._period_stats(period)
+            for lo in range(0, len(std_facs), chunk):
+                block = slice(lo, lo + chunk)
+                gains[i, block], penalties[i, block] = self._score_factors(period_stats, std_facs[block])
+        return gains, penalties
+
+    def fitness_batch(self, periods, std_facs):
+        gains, penalties = self.score_batch(periods, std_facs)
+        return gains - (penalties * PENALTY_WEIGHT)
+
+
+class FitnessCache:
+    # Cache LRU de (ganho, penalidade) por (dataset, period, std_fac) decodificados. Genomas diferentes
+    # que decodificam para o mesmo par, e filhos idênticos a indivíduos já avaliados, não recalculam.
+    # Com path, as entradas são lidas no início e gravadas por save() para a próxima execução.
+    def __init__(self, maxsize=FITNESS_CACHE_SIZE, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                self.entries.update(pickle.load(f))
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def score(self, context, period, std_fac):
+        key = (context.fingerprint, int(period), float(std_fac))
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        result = self.entries[key] = context.score(period, std_fac)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return result
+
+    def score_batch(self, context, periods, std_facs):
+        # Consulta o cache par a par e calcula só as faltas (sem repetições) em um único score_batch
+        keys = [(context.fingerprint, int(period), float(std_fac)) for period, std_fac in zip(periods, std_facs)]
+        missing = list(dict.fromkeys(key for key in keys if key not in self.entries))
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+
+        computed = {}
+        if missing:
+            gains, penalties = context.score_batch([key[1] for key in missing], [key[2] for key in missing])
+            computed = {key: (int(g), int(p)) for key, g, p in zip(missing, gains, penalties)}
+        results = []
+        for key in keys:
+            if key in computed:
+                results.append(computed[key])
+            else:
+                self.entries.move_to_end(key)
+                results.append(self.entries[key])
+        for key, result in computed.items():
+            self.entries[key] = result
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return results
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries),
+                'hit_rate': self.hits / total if total else 0.0}
+
+    def save(self, path=None):
+        path = path or self.path
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(list(self.entries.items()), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
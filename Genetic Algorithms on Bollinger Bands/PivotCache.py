@@ -0,0 +1,109 @@
+import copy
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from PivotDetector import StreamingPivotDetector
+
+# Incrementar sempre que as regras do detector mudarem (invalida todo o cache gravado)
+DETECTOR_VERSION = 1
+
+DAY = pd.Timedelta(days=1).value
+
+# Layout em disco, um arquivo por (versão, timeframe maior, ticker, primeiro dia do intervalo):
+#   <root>/v<versão>/<timeframe>/<id_ticker>/<AAAA-MM-DD>.pkl
+# O arquivo guarda, para cada dia do intervalo, a impressão digital encadeada dos candles menores
+# (dia atual + todos os anteriores), os eventos confirmados no dia e o estado do detector incremental
+# no fim do dia. Um intervalo que começa no mesmo dia reaproveita todos os dias cuja impressão
+# confere e só processa, a partir do último estado salvo, os dias novos ou alterados.
+
+
+class PivotCache:
+    def __init__(self, root='pivot_cache'):
+        self.root = root
+        self.days_reused = 0
+        self.days_computed = 0
+
+    def _path(self, id_ticker, coarse_width, first_day):
+        width = f"{int(pd.Timedelta(coarse_width).total_seconds() // 60)}min"
+        day = pd.Timestamp(first_day).strftime('%Y-%m-%d')
+        return os.path.join(self.root, f"v{DETECTOR_VERSION}", width, str(id_ticker), f"{day}.pkl")
+
+    def _load(self, path):
+        if not os.path.exists(path):
+            return []
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _save(self, path, entries):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def pivots(self, id_ticker, fine, coarse_width=pd.Timedelta(minutes=60)):
+        # fine: candles menores de um único ticker (índice datetime ordenado, colunas open/close).
+        # Devolve (topos, fundos, pontos_confirmacao) no mesmo formato do detect_pivots.
+        ts = fine.index.asi8
+        if not len(ts):
+            return [], [], []
+        open_ = fine['open'].to_numpy(dtype='float64')
+        close = fine['close'].to_numpy(dtype='float64')
+
+        day = ts - ts % DAY
+        bounds = np.flatnonzero(day[1:] != day[:-1]) + 1
+        starts = np.append(0, bounds)
+        ends = np.append(bounds, len(ts))
+
+        path = self._path(id_ticker, coarse_width, day[0])
+        stored = self._load(path)
+        entries = []
+        detector = StreamingPivotDetector(coarse_width)
+        digest = b''
+        computed = 0
+        for lo, hi in zip(starts, ends):
+            digest = hashlib.sha1(
+                digest + ts[lo:hi].tobytes() + open_[lo:hi].tobytes() + close[lo:hi].tobytes()
+            ).digest()
+            if not computed and len(entries) < len(stored) and stored[len(entries)]['fingerprint'] == digest:
+                entries.append(stored[len(entries)])
+                continue
+            if not computed and entries:
+                # Continua do estado salvo no fim do último dia reaproveitado
+                detector = copy.copy(entries[-1]['state'])
+            events = []
+            for i in range(lo, hi):
+                events.extend(detector.update(ts[i], open_[i], close[i]))
+            entries.append({
+                'day': pd.Timestamp(day[lo]).strftime('%Y-%m-%d'),
+                'fingerprint': digest,
+                'events': events,
+                'state': copy.copy(detector),
+            })
+            computed += 1
+
+        self.days_reused += len(entries) - computed
+        self.days_computed += computed
+        # Um intervalo menor, todo reaproveitado, não sobrescreve o arquivo mais longo
+        if computed:
+            self._save(path, entries)
+
+        # O fim dos dados é avaliado sobre uma cópia do estado, que continua válido para extensões
+        events = [event for entry in entries for event in entry['events']]
+        events.extend(copy.copy(entries[-1]['state']).flush())
+
+        pontos_confirmacao = [(e.timestamp, e.close) for e in events]
+        topos = [(e.timestamp, e.close) for e in events if e.kind == 'topo']
+        fundos = [(e.timestamp, e.close) for e in events if e.kind == 'fundo']
+        return topos, fundos, pontos_confirmacao
+
+    def pivots_by_ticker(self, candles_by_ticker, coarse_width=pd.Timedelta(minutes=60)):
+        # {id_ticker: candles menores} -> {id_ticker: (topos, fundos, pontos_confirmacao)}
+        return {
+            id_ticker: self.pivots(id_ticker, fine, coarse_width)
+            for id_ticker, fine in candles_by_ticker.items()
+        }
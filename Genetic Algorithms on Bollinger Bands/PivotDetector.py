@@ -0,0 +1,227 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Detector de topos e fundos vetorizado, genérico para qualquer par (timeframe maior, timeframe menor).
+# Regras (as mesmas do laço original sobre os candles de 60 minutos):
+#  - uma sequência de alta é formada por candles consecutivos com close > open;
+#  - uma sequência de baixa começa em um candle com close <= open e continua enquanto close < open;
+#  - o candle de maior (alta) / menor (baixa) fechamento da sequência é escolhido (primeiro em caso de empate)
+#    e, dentro dele, o primeiro candle menor com o maior / menor fechamento vira o topo / fundo;
+#  - se o candle maior logo após a sequência tiver um candle menor com fechamento mais extremo, ele
+#    substitui o topo / fundo;
+#  - a sequência que começa no último candle maior não é avaliada.
+
+
+def _segment_reduce(ufunc, values, lo, hi, fill):
+    # Aplica ufunc.reduceat em cada intervalo [lo, hi) de `values`; intervalos vazios recebem `fill`
+    extended = np.append(values, fill)
+    bounds = np.empty(2 * len(lo), dtype=np.intp)
+    bounds[0::2] = lo
+    bounds[1::2] = hi
+    reduced = ufunc.reduceat(extended, bounds)[0::2]
+    return np.where(lo < hi, reduced, fill)
+
+
+def _first_extreme(fine_close, lo, hi, ufunc):
+    # Valor extremo de cada intervalo e a posição da primeira ocorrência dele
+    n_fine = len(fine_close)
+    extreme = _segment_reduce(ufunc, fine_close, lo, hi, np.nan)
+
+    # Para cada candle menor, o intervalo (candle maior) ao qual ele pertence
+    positions = np.arange(n_fine)
+    segment = np.searchsorted(lo, positions, side='right') - 1
+    inside = (segment >= 0) & (positions < hi[np.clip(segment, 0, None)])
+    is_extreme = inside & (fine_close == extreme[np.clip(segment, 0, None)])
+
+    first = _segment_reduce(np.minimum, np.where(is_extreme, positions, n_fine), lo, hi, n_fine)
+    return extreme, first
+
+
+def detect_pivots(coarse, fine, coarse_width):
+    # coarse/fine: dataframes de candles (índice datetime ordenado, colunas open/close);
+    # coarse_width: duração de um candle maior (ex.: pd.Timedelta(minutes=60))
+    topos = []
+    fundos = []
+    pontos_confirmacao = []
+
+    n = len(coarse)
+    if n < 2:
+        return topos, fundos, pontos_confirmacao
+
+    c_open = coarse['open'].to_numpy(dtype='float64')
+    c_close = coarse['close'].to_numpy(dtype='float64')
+    up = c_close > c_open
+    doji = c_close == c_open
+
+    # Codificação por sequências (run-length) da direção dos candles maiores
+    start = np.empty(n, dtype=bool)
+    start[0] = True
+    start[1:] = (up[1:] != up[:-1]) | doji[1:]
+    starts = np.flatnonzero(start)
+    ends = np.append(starts[1:] - 1, n - 1)
+    run_up = up[starts]
+    lengths = ends - starts + 1
+
+    # Candle maior com o fechamento extremo de cada sequência (primeira ocorrência)
+    run_max = np.maximum.reduceat(c_close, starts)
+    run_min = np.minimum.reduceat(c_close, starts)
+    target = np.repeat(np.where(run_up, run_max, run_min), lengths)
+    candidates = np.where(c_close == target, np.arange(n), n)
+    pick = np.minimum.reduceat(candidates, starts)
+
+    # Intervalo de candles menores dentro de cada candle maior, via searchsorted
+    fine_ts = fine.index.asi8
+    coarse_ts = coarse.index.asi8
+    lo = np.searchsorted(fine_ts, coarse_ts, side='left')
+    hi = np.searchsorted(fine_ts, coarse_ts + pd.Timedelta(coarse_width).value, side='left')
+
+    fine_close = fine['close'].to_numpy(dtype='float64')
+    seg_max, first_max = _first_extreme(fine_close, lo, hi, np.maximum)
+    seg_min, first_min = _first_extreme(fine_close, lo, hi, np.minimum)
+    has_fine = lo < hi
+
+    # Sequências avaliadas: todas, exceto a que começa no último candle maior
+    runs = np.flatnonzero(starts < n - 1)
+    p = pick[runs]
+    nxt = ends[runs] + 1
+    nxt_ok = nxt < n
+    nxt_c = np.where(nxt_ok, nxt, 0)
+    is_up = run_up[runs]
+
+    value = np.where(is_up, seg_max[p], seg_min[p])
+    position = np.where(is_up, first_max[p], first_min[p])
+    nxt_value = np.where(is_up, seg_max[nxt_c], seg_min[nxt_c])
+    nxt_position = np.where(is_up, first_max[nxt_c], first_min[nxt_c])
+
+    # Troca pelo candle seguinte quando ele tem um fechamento mais extremo
+    better = nxt_ok & has_fine[nxt_c] & np.where(is_up, nxt_value > value, nxt_value < value)
+    value = np.where(better, nxt_value, value)
+    position = np.where(better, nxt_position, position)
+
+    valid = has_fine[p]
+    fine_index = fine.index
+    for run_is_up, pos, val in zip(is_up[valid], position[valid], value[valid]):
+        ponto = (fine_index[pos], np.float64(val))
+        (topos if run_is_up else fundos).append(ponto)
+        pontos_confirmacao.append(ponto)
+
+    return topos, fundos, pontos_confirmacao
+
+
+# Evento emitido pelo detector incremental: kind 'topo' ou 'fundo', timestamp/close do candle menor
+# escolhido e confirmed_at, o candle menor que confirmou o evento
+PivotEvent = namedtuple('PivotEvent', ['kind', 'timestamp', 'close', 'confirmed_at'])
+
+
+class StreamingPivotDetector:
+    # Mesmas regras do detect_pivots, mas alimentado com um candle menor por vez e com estado O(1):
+    # o candle maior em formação, a sequência atual e o melhor ponto dela. Um topo/fundo é emitido
+    # assim que o candle maior seguinte à sequência fecha (ele decide a troca final do ponto).
+    def __init__(self, coarse_width=pd.Timedelta(minutes=60)):
+        self.width = pd.Timedelta(coarse_width).value
+        # candle maior em formação
+        self.bucket = None
+        self.open = self.close = None
+        self.max_close = self.max_ts = None
+        self.min_close = self.min_ts = None
+        # sequência atual (formada apenas por candles maiores já fechados)
+        self.run_up = None
+        self.run_len = 0
+        self.run_best = None  # fechamento extremo entre os candles maiores da sequência
+        self.run_pivot = None  # (ts, close) do candle menor escolhido
+        self.last_ts = None
+
+    def update(self, timestamp, open, close):
+        # Recebe um candle menor (em ordem cronológica) e devolve a lista de eventos confirmados
+        ts = pd.Timestamp(timestamp).value
+        bucket = ts - ts % self.width
+        events = []
+        if self.bucket is not None and bucket != self.bucket:
+            events = self._close_bucket(confirmed_at=ts)
+        if self.bucket is None or bucket != self.bucket:
+            self.bucket = bucket
+            self.open = open
+            self.max_close = self.min_close = None
+        self.close = close
+        if self.max_close is None or close > self.max_close:
+            self.max_close, self.max_ts = close, ts
+        if self.min_close is None or close < self.min_close:
+            self.min_close, self.min_ts = close, ts
+        self.last_ts = ts
+        return events
+
+    def flush(self):
+        # Fim dos dados: fecha o candle maior em formação e avalia a sequência que chega até ele
+        # (a sequência formada só pelo último candle maior não é avaliada, como no detector em lote)
+        events = []
+        if self.bucket is not None:
+            events = self._close_bucket(confirmed_at=self.last_ts)
+            self.bucket = None
+        if self.run_len >= 2:
+            events.append(self._event(self.run_pivot, self.last_ts))
+        self.run_up = None
+        self.run_len = 0
+        return events
+
+    def _event(self, pivot, confirmed_at):
+        ts, close = pivot
+        return PivotEvent('topo' if self.run_up else 'fundo', pd.Timestamp(ts), np.float64(close),
+                          pd.Timestamp(confirmed_at))
+
+    def _close_bucket(self, confirmed_at):
+        events = []
+        up = self.close > self.open
+        if self.run_up is not None:
+            continues = up if self.run_up else self.close < self.open
+            if continues:
+                self.run_len += 1
+                if (self.close > self.run_best) if self.run_up else (self.close < self.run_best):
+                    self.run_best = self.close
+                    self.run_pivot = (self.max_ts, self.max_close) if self.run_up else (self.min_ts, self.min_close)
+                return events
+
+            # Este candle maior encerra a sequência e pode trocar o ponto por um mais extremo
+            ts, close = self.run_pivot
+            if self.run_up and self.max_close > close:
+                self.run_pivot = (self.max_ts, self.max_close)
+            elif not self.run_up and self.min_close < close:
+                self.run_pivot = (self.min_ts, self.min_close)
+            events.append(self._event(self.run_pivot, confirmed_at))
+
+        # Nova sequência começando neste candle maior
+        self.run_up = up
+        self.run_len = 1
+        self.run_best = self.close
+        self.run_pivot = (self.max_ts, self.max_close) if up else (self.min_ts, self.min_close)
+        return events
+
+
+class UniversePivotDetector:
+    # Um StreamingPivotDetector por id_ticker (memória constante por ticker)
+    def __init__(self, coarse_width=pd.Timedelta(minutes=60)):
+        self.coarse_width = coarse_width
+        self.detectors = {}
+
+    def update(self, id_ticker, timestamp, open, close):
+        detector = self.detectors.get(id_ticker)
+        if detector is None:
+            detector = self.detectors[id_ticker] = StreamingPivotDetector(self.coarse_width)
+        return [(id_ticker, event) for event in detector.update(timestamp, open, close)]
+
+    def flush(self):
+        return [(id_ticker, event) for id_ticker, detector in self.detectors.items() for event in detector.flush()]
+
+
+def detect_pivots_streaming(fine, coarse_width=pd.Timedelta(minutes=60), detector=None):
+    # Passa um dataframe de candles menores pelo detector incremental e devolve o formato do lote
+    detector = detector or StreamingPivotDetector(coarse_width)
+    events = []
+    for ts, open, close in zip(fine.index, fine['open'].to_numpy(), fine['close'].to_numpy()):
+        events.extend(detector.update(ts, open, close))
+    events.extend(detector.flush())
+    pontos_confirmacao = [(e.timestamp, e.close) for e in events]
+    topos = [(e.timestamp, e.close) for e in events if e.kind == 'topo']
+    fundos = [(e.timestamp, e.close) for e in events if e.kind == 'fundo']
+    return topos, fundos, pontos_confirmacao
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+OHLCV = ('open', 'close', 'high', 'low', 'volume')
+DAY = pd.Timedelta(days=1).value
+
+# Agregação de cada campo dentro de um candle/barra; campos fora daqui são somados
+FIELD_AGG = {'open': 'first', 'close': 'last', 'high': 'max', 'low': 'min'}
+
+
+def time_bins(ts, freq):
+    # Início do candle de cada timestamp (ns) na grade de `freq` ancorada na meia-noite do dia
+    width = pd.Timedelta(freq).value
+    day = ts - ts % DAY
+    return day + (ts - day) // width * width
+
+
+def sorted_rows(df, fields):
+    # Linhas ordenadas por (ticker, timestamp) mantendo a ordem original entre iguais:
+    # devolve (ts em ns, ticker, {campo: array}); sem id_ticker, todas as linhas são de um só ticker
+    ts = pd.DatetimeIndex(df.index).as_unit('ns').asi8
+    ticker = df['id_ticker'].to_numpy() if 'id_ticker' in df.columns else np.zeros(len(df), dtype='int8')
+    order = np.lexsort((ts, ticker))
+    if np.all(order[1:] > order[:-1]):
+        order = slice(None)
+    return ts[order], ticker[order], {name: df[name].to_numpy()[order] for name in fields}
+
+
+def aggregate_bins(ticker, values, bins, labels, columns, index_name=None):
+    # Um candle por sequência de linhas com o mesmo (ticker, bins), agregado em uma passada com
+    # np.*.reduceat. labels: rótulo (ns) de cada linha; o candle recebe o da sua primeira linha.
+    # Resultado em ordem cronológica, com os tickers do mesmo horário lado a lado.
+    new_bin = np.empty(len(bins), dtype=bool)
+    new_bin[0] = True
+    new_bin[1:] = (bins[1:] != bins[:-1]) | (ticker[1:] != ticker[:-1])
+    starts = np.flatnonzero(new_bin)
+    ends = np.append(starts[1:], len(bins)) - 1
+
+    out = {'id_ticker': ticker[starts]}
+    for name, v in values.items():
+        how = FIELD_AGG.get(name, 'sum')
+        if how == 'first':
+            out[name] = v[starts]
+        elif how == 'last':
+            out[name] = v[ends]
+        elif how == 'max':
+            out[name] = np.maximum.reduceat(v, starts)
+        elif how == 'min':
+            out[name] = np.minimum.reduceat(v, starts)
+        else:
+            out[name] = np.add.reduceat(v, starts)
+
+    labels = labels[starts]
+    chronological = np.lexsort((out['id_ticker'], labels))
+    return pd.DataFrame(
+        {name: out[name][chronological] for name in columns},
+        index=pd.DatetimeIndex(labels[chronological].view('datetime64[ns]'), name=index_name),
+    )
+
+
+def resample_candles(df, freq):
+    # Reamostragem OHLCV em grade fixa por (id_ticker, pregão), sem calendário:
+    #  - os limites dos candles saem dos próprios timestamps ordenados (grade ancorada na meia-noite
+    #    de cada dia), então noites e fins de semana nunca geram candles vazios;
+    #  - tickers diferentes nunca caem no mesmo candle;
+    #  - open/close/high/low/volume são agregados em uma passada com np.*.reduceat.
+    # Resultado: índice datetime (rótulo = início do candle), ordenado por (datetime, id_ticker).
+    columns = (['id_ticker'] if 'id_ticker' in df.columns else []) + list(OHLCV)
+
+    df = df.dropna(subset=list(OHLCV))
+    if df.empty:
+        return df[columns].iloc[0:0]
+
+    ts, ticker, values = sorted_rows(df, OHLCV)
+    bins = time_bins(ts, freq)
+    return aggregate_bins(ticker, values, bins, bins, columns, df.index.name)
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Períodos das Bandas de Bollinger cobertos pelo AG (5 bits decodificados em 2..30)
+PERIODS = range(2, 31)
+
+# Limite para as somas de quadrados continuarem exatas em int64
+EXACT_LIMIT = 2 ** 62
+
+
+def _group_codes(groups):
+    # Um código inteiro por linha; groups é um array ou uma lista de arrays (ex.: [id_ticker, session])
+    if isinstance(groups, (list, tuple)):
+        return pd.MultiIndex.from_arrays([np.asarray(g) for g in groups]).factorize()[0]
+    return pd.factorize(np.asarray(groups))[0]
+
+
+class RollingStats:
+    # Média e desvio padrão móveis para qualquer período a partir de somas acumuladas de x e x².
+    # Preços em ticks inteiros usam somas int64, então a soma da janela e o numerador da variância
+    # (p·Σx² - (Σx)²) são exatos; valores não inteiros usam float64 deslocado pelo primeiro valor.
+    # Com groups, as janelas recomeçam a cada grupo (mesmo resultado de groupby(...).rolling).
+    def __init__(self, values, groups=None):
+        values = np.asarray(values)
+        n = len(values)
+        if values.dtype.kind == 'f' and not np.all(np.isfinite(values)):
+            raise ValueError("RollingStats needs finite values.")
+
+        # Linhas do mesmo grupo lado a lado (ordem estável); os resultados voltam à ordem original
+        self.order = None
+        codes = np.zeros(n, dtype=np.intp) if groups is None else _group_codes(groups)
+        if n and np.any(codes[1:] < codes[:-1]):
+            self.order = np.argsort(codes, kind='stable')
+            values = values[self.order]
+            codes = codes[self.order]
+        new_group = np.ones(n, dtype=bool)
+        new_group[1:] = codes[1:] != codes[:-1]
+        self.start = np.maximum.accumulate(np.where(new_group, np.arange(n), 0)) if n else np.empty(0, np.intp)
+
+        integral = values.dtype.kind in 'iub' or (values.dtype.kind == 'f' and np.array_equal(values, np.round(values)))
+        peak = float(np.abs(values).max()) if n else 0.0
+        self.exact = integral and peak * peak * max(n, 1) < EXACT_LIMIT
+        if self.exact:
+            x = values.astype('int64')
+            self.shift = 0
+        else:
+            self.shift = float(values[0]) if n else 0.0
+            x = values.astype('float64') - self.shift
+        self.n = n
+        self.c1 = np.concatenate(([0], np.cumsum(x))).astype(x.dtype)
+        self.c2 = np.concatenate(([0], np.cumsum(x * x))).astype(x.dtype)
+
+    def _restore(self, result):
+        # Desfaz a ordenação por grupo (funciona também para arrays 2-D, uma linha por período)
+        if self.order is None:
+            return result
+        out = np.empty_like(result)
+        out[..., self.order] = result
+        return out
+
+    def _window(self, periods, ddof):
+        # periods: array 1-D de períodos; devolve (média, desvio) com shape (len(periods), n)
+        p = np.asarray(periods, dtype='int64')[:, None]
+        end = np.arange(1, self.n + 1)[None, :]
+        first = end - p
+        valid = first >= self.start[None, :]
+        first = np.where(valid, first, 0)
+        s1 = self.c1[end] - self.c1[first]
+        s2 = self.c2[end] - self.c2[first]
+
+        numerator = p * s2 - s1 * s1
+        mean = s1 / p + self.shift
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = np.maximum(numerator, 0) / (p * (p - ddof))
+        std = np.sqrt(var)
+        mean = np.where(valid, mean, np.nan)
+        std = np.where(valid & (p > ddof), std, np.nan)
+        return self._restore(mean), self._restore(std)
+
+    def mean_std(self, period, ddof=1):
+        mean, std = self._window([period], ddof)
+        return mean[0], std[0]
+
+    def mean(self, period):
+        return self.mean_std(period)[0]
+
+    def std(self, period, ddof=1):
+        return self.mean_std(period, ddof)[1]
+
+    def all_periods(self, periods=PERIODS, ddof=1):
+        # Todas as médias e desvios de uma vez: arrays 2-D (len(periods), n)
+        return self._window(list(periods), ddof)
+
+    def bands(self, period, std_fac):
+        # Bandas de Bollinger (superior, inferior) para um período
+        sma, std = self.mean_std(period)
+        return sma + (std * std_fac), sma - (std * std_fac)
@@ -0,0 +1,154 @@
+import argparse
+import os
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from BovDB import tickers
+from CandleArrays import attach, save_candle_arrays
+from DataProcessor import DataProcessor
+from FitnessEngine import PENALTY_WEIGHT, BollingerFitness
+from GAonBollingerBands import grid_search, main
+from PivotDetector import detect_pivots
+from Resampler import resample_candles
+
+# Otimização walk-forward das Bandas de Bollinger: o histórico é dividido em janelas móveis de
+# treino/teste por mês; cada (ticker, janela) é otimizado em um processo do pool sobre o treino e
+# avaliado fora da amostra no teste. O resultado é uma tabela com ganho/penalidade dentro e fora.
+# O banco é lido uma única vez no processo pai: os candles de 5 minutos de cada ticker são gravados
+# como arrays (CandleArrays) e cada processo abre os arquivos via mmap e fatia a sua janela por ts.
+
+CANDLE_COLUMNS = ['open', 'close', 'high', 'low', 'volume']
+# Timeframe maior do detector de topos e fundos (o menor são os próprios candles de 5 minutos)
+COARSE = '60min'
+
+
+def walk_forward_windows(start, end, train_months=3, test_months=1, step_months=1):
+    # [(train_start, train_end, test_start, test_end)] com datas 'AAAA-MM-DD' e meses inteiros
+    months = pd.date_range(pd.Timestamp(start).to_period('M').to_timestamp(), end, freq='MS')
+    last_day = pd.Timestamp(end)
+    windows = []
+    for i in range(0, len(months), step_months):
+        if i + train_months + test_months > len(months):
+            break
+        train_start = months[i]
+        test_start = months[i + train_months]
+        test_end = min(test_start + pd.DateOffset(months=test_months) - pd.Timedelta(days=1), last_day)
+        windows.append((
+            max(train_start, pd.Timestamp(start)).strftime('%Y-%m-%d'),
+            (test_start - pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
+            test_start.strftime('%Y-%m-%d'),
+            test_end.strftime('%Y-%m-%d'),
+        ))
+    return windows
+
+
+def save_candles(db_path, id_tickers, start, end, root):
+    # Carga única de todo o intervalo; grava um diretório de arrays por ticker com dados
+    query = tickers(id_tickers).between(start, end).columns(CANDLE_COLUMNS)
+    processor = DataProcessor(db_path, query)
+    processor.load_data()
+    processor.process_data()
+    save_candle_arrays(processor.candles_by_ticker('5min'), root)
+    return root
+
+
+def build_context(root, id_tickers, start, end):
+    # Candles de 5 minutos de um intervalo (fatias dos arrays mapeados, sem cópia) e os topos/fundos
+    # detectados nesse intervalo, prontos para o FitnessEngine
+    stop = pd.Timestamp(end) + pd.Timedelta(days=1)
+    candles = {}
+    for id_ticker in id_tickers:
+        if os.path.isdir(os.path.join(root, str(id_ticker))):
+            window = attach(root, id_ticker).between(start, stop)
+            if len(window):
+                candles[id_ticker] = window
+    if not candles:
+        return None
+    pivots = {}
+    for id_ticker, window in candles.items():
+        fine = window.to_frame()
+        pivots[id_ticker] = detect_pivots(resample_candles(fine, COARSE), fine, pd.Timedelta(COARSE))
+    return BollingerFitness(candles, pivots)
+
+
+def optimize_window(task):
+    # Executado em um processo do pool: otimiza no treino e avalia os parâmetros no teste
+    root, id_tickers, (train_start, train_end, test_start, test_end), mode, seed = task
+    row = {'id_tickers': ','.join(map(str, id_tickers)), 'train_start': train_start, 'train_end': train_end,
+           'test_start': test_start, 'test_end': test_end}
+    if mode == 'ga':
+        row['seed'] = seed
+
+    train = build_context(root, id_tickers, train_start, train_end)
+    test = build_context(root, id_tickers, test_start, test_end)
+    if train is None or test is None:
+        return row
+
+    if mode == 'grid':
+        period, std_fac = grid_search(train)[:2]
+    else:
+        # Semente própria da tarefa: o resultado não depende do processo nem da ordem de execução
+        random.seed(seed)
+        period, std_fac = main(train)
+    row.update({'period': period, 'std_fac': std_fac})
+
+    for prefix, context in (('is', train), ('oos', test)):
+        totals = context.detail(period, std_fac)
+        gain = totals['gaintopo'] + totals['gainvale']
+        row.update({
+            f'{prefix}_gain': gain,
+            f'{prefix}_penalty': totals['penalty'],
+            f'{prefix}_fitness': gain - (totals['penalty'] * PENALTY_WEIGHT),
+            f'{prefix}_topos_errados': totals['testeTopo'],
+            f'{prefix}_vales_errados': totals['testeVale'],
+        })
+    return row
+
+
+def walk_forward(db_path, id_tickers, start, end, train_months=3, test_months=1, step_months=1,
+                 mode='grid', per_ticker=True, workers=None, seed=0, candles_dir=None):
+    # Uma tarefa por (ticker, janela); com per_ticker=False todos os tickers são otimizados juntos.
+    # No modo 'ga' a tarefa i usa a semente seed + i. Os arrays ficam em candles_dir (padrão: um
+    # diretório temporário apagado ao final)
+    groups = [[id_ticker] for id_ticker in id_tickers] if per_ticker else [list(id_tickers)]
+    windows = walk_forward_windows(start, end, train_months, test_months, step_months)
+    pairs = [(group, window) for group in groups for window in windows]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = save_candles(db_path, id_tickers, start, end, candles_dir or tmp)
+        tasks = [(root, group, window, mode, seed + i) for i, (group, window) in enumerate(pairs)]
+        workers = workers or os.cpu_count()
+        if workers == 1:
+            rows = list(map(optimize_window, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                rows = list(executor.map(optimize_window, tasks))
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Otimização walk-forward das Bandas de Bollinger')
+    parser.add_argument('--db', default=r'C:\\Users\\othav\\BovDB.v2\\Database_define.db')
+    parser.add_argument('--tickers', type=int, nargs='+', default=[58413, 2952, 2963, 2978])
+    parser.add_argument('--start', default='2024-01-01')
+    parser.add_argument('--end', default='2024-06-30')
+    parser.add_argument('--train-months', type=int, default=3)
+    parser.add_argument('--test-months', type=int, default=1)
+    parser.add_argument('--step-months', type=int, default=1)
+    parser.add_argument('--mode', choices=['grid', 'ga'], default='grid')
+    parser.add_argument('--juntos', action='store_true', help='otimiza todos os tickers juntos em cada janela')
+    parser.add_argument('--workers', type=int, default=None, help='processos (padrão: núcleos)')
+    parser.add_argument('--seed', type=int, default=0, help='semente do AG (a tarefa i usa seed + i)')
+    parser.add_argument('--candles-dir', default=None, help='onde gravar os arrays de candles (padrão: temporário)')
+    parser.add_argument('--output', default='walk_forward.csv')
+    args = parser.parse_args()
+
+    table = walk_forward(args.db, args.tickers, args.start, args.end, args.train_months, args.test_months,
+                         args.step_months, args.mode, not args.juntos, args.workers, args.seed,
+                         args.candles_dir)
+    table.to_csv(args.output, index=False)
+    print(table.to_string(index=False))
+    print(f"Tabela salva em {args.output}")